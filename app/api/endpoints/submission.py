@@ -1,4 +1,47 @@
-from fastapi import APIRouter
+from typing import Optional
 
+from fastapi import APIRouter, File, Header, HTTPException, Request, UploadFile, status
 
-submission_router = APIRouter()
\ No newline at end of file
+from app.models import InputUploadResponse
+from app.services import input_storage
+
+
+submission_router = APIRouter()
+
+
+async def _save(chunks, expected_sha256: Optional[str]) -> InputUploadResponse:
+    try:
+        input_id, sha256, size = await input_storage.save_stream(chunks, expected_sha256)
+    except input_storage.InputTooLarge as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except input_storage.InputChecksumMismatch as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return InputUploadResponse(input_id=input_id, sha256=sha256, size_bytes=size)
+
+
+@submission_router.put("/inputs", response_model=InputUploadResponse, status_code=status.HTTP_201_CREATED)
+async def upload_input_stream(request: Request, x_content_sha256: Optional[str] = Header(None)):
+    """
+    Upload a test input as the raw request body (plain or chunked transfer encoding).
+    The body is streamed to storage, never held in memory. Pass the returned
+    `input_id` as `stdin_ref` when submitting code.
+    """
+    return await _save(request.stream(), x_content_sha256)
+
+
+@submission_router.post("/inputs", response_model=InputUploadResponse, status_code=status.HTTP_201_CREATED)
+async def upload_input_file(file: UploadFile = File(...), x_content_sha256: Optional[str] = Header(None)):
+    """
+    Upload a test input as a multipart form file, copied to storage in chunks.
+    The form is parsed and spooled to a temporary file before this handler
+    runs, so the input is written twice; prefer `PUT /submissions/inputs`
+    for large inputs.
+    """
+    async def chunks():
+        while True:
+            chunk = await file.read(input_storage.CHUNK_BYTES)
+            if not chunk:
+                return
+            yield chunk
+
+    return await _save(chunks(), x_content_sha256)
@@ -0,0 +1,98 @@
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+# Opt-in tracing. Spans follow the OpenTelemetry data model (W3C trace/span IDs,
+# parent links, start/end in unix nanoseconds) and are written as JSON lines to a
+# local file, so they can be inspected offline or replayed into an OTLP collector.
+TRACING_ENABLED = os.getenv("OJ_TRACING_ENABLED", "false").lower() in ("1", "true", "yes")
+TRACE_FILE = os.getenv("OJ_TRACE_FILE", "oj-traces.jsonl")
+
+
+def _new_trace_id() -> str:
+    return secrets.token_hex(16)
+
+
+def _new_span_id() -> str:
+    return secrets.token_hex(8)
+
+
+def parse_traceparent(traceparent: Optional[str]):
+    """Return (trace_id, parent_span_id) from a W3C traceparent header, or (None, None)."""
+    if not traceparent:
+        return None, None
+    parts = traceparent.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None, None
+    return parts[1], parts[2]
+
+
+class FileSpanExporter:
+    """Append finished spans to a JSON lines file."""
+
+    def __init__(self, path: str = TRACE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Dict[str, Any]) -> None:
+        line = json.dumps(span)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+class Trace:
+    """
+    Collects spans for a single submission.
+
+    Phase durations are always accumulated into ``timings`` (cheap perf_counter
+    arithmetic) so they can be returned in debug mode; spans are only exported
+    when tracing is enabled.
+    """
+
+    def __init__(
+        self,
+        traceparent: Optional[str] = None,
+        enabled: bool = TRACING_ENABLED,
+        exporter: Optional[FileSpanExporter] = None,
+    ):
+        trace_id, parent_span_id = parse_traceparent(traceparent)
+        self.trace_id = trace_id or _new_trace_id()
+        self.enabled = enabled
+        self.exporter = exporter or (FileSpanExporter() if enabled else None)
+        self.timings: Dict[str, float] = {}
+        self._stack: List[str] = [parent_span_id] if parent_span_id else []
+
+    @property
+    def traceparent(self) -> str:
+        """W3C traceparent for the current span, used to propagate context downstream."""
+        span_id = self._stack[-1] if self._stack else _new_span_id()
+        return f"00-{self.trace_id}-{span_id}-01"
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any):
+        span_id = _new_span_id()
+        parent_id = self._stack[-1] if self._stack else None
+        self._stack.append(span_id)
+        start_ns = time.time_ns()
+        start = time.perf_counter()
+        try:
+            yield span_id
+        finally:
+            duration = time.perf_counter() - start
+            self._stack.pop()
+            self.timings[name] = round(self.timings.get(name, 0.0) + duration, 4)
+            if self.enabled and self.exporter is not None:
+                self.exporter.export({
+                    "trace_id": self.trace_id,
+                    "span_id": span_id,
+                    "parent_span_id": parent_id,
+                    "name": name,
+                    "start_time_unix_nano": start_ns,
+                    "end_time_unix_nano": start_ns + int(duration * 1_000_000_000),
+                    "attributes": attributes,
+                })
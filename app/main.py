@@ -1,12 +1,17 @@
 import json
 import uuid
 import os
-from fastapi import FastAPI, status, HTTPException
+from typing import Optional
+from fastapi import FastAPI, status, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
 import redis
 from app.api.routes import api_router
 from app.models import CodeSubmission, SubmissionResponse, ExecutionResult
-from tasks.tasks import execute_code
+from app.core.tracing import Trace
+from tasks.tasks import dispatch
+from tasks.leases import store_payload
+from app.services.fleet import live_workers
+from app.services import input_storage
 
 app = FastAPI(title="Online Judge API", version="1.0.0")
 
@@ -31,13 +36,39 @@ def read_root():
 
 
 @app.post("/execute", response_model=SubmissionResponse, status_code=status.HTTP_202_ACCEPTED)
-def submit_code(submission: CodeSubmission):
+def submit_code(
+    submission: CodeSubmission,
+    traceparent: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None),
+):
     """
     Submit code for execution. Returns a submission ID immediately.
     The code will be executed asynchronously by a worker.
+    An incoming W3C `traceparent` header is continued into the worker.
+    Repeating a request with the same `Idempotency-Key` header returns the
+    original submission instead of queueing it again.
     """
+    if submission.stdin_ref:
+        if submission.stdin_data:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Provide either stdin_data or stdin_ref, not both"
+            )
+        if not input_storage.exists(submission.stdin_ref):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Input {submission.stdin_ref} not found"
+            )
+
     # Generate unique submission ID
     submission_id = str(uuid.uuid4())
+    trace = Trace(traceparent)
+
+    if idempotency_key:
+        key = f"idempotency:{idempotency_key}"
+        if not redis_client.set(key, submission_id, nx=True, ex=3600):
+            existing = redis_client.get(key).decode()
+            return SubmissionResponse(submission_id=existing, status="PENDING")
     
     # Store initial status in Redis
     initial_result = {
@@ -50,22 +81,36 @@ def submit_code(submission: CodeSubmission):
         "time_sec": None,
     }
     
-    redis_client.setex(
-        f"submission:{submission_id}",
-        3600,  # 1 hour TTL
-        json.dumps(initial_result)
-    )
-    
-    # Queue the task for background execution
-    execute_code.delay(
-        submission_id=submission_id,
-        source_code=submission.source_code,
-        stdin_data=submission.stdin_data,
-        time_limit_sec=submission.time_limit_sec,
-        memory_limit_mb=submission.memory_limit_mb,
-        cpu_cores=submission.cpu_cores,
-        lang=submission.lang
-    )
+    with trace.span("api.submit", submission_id=submission_id, lang=submission.lang):
+        redis_client.setex(
+            f"submission:{submission_id}",
+            3600,  # 1 hour TTL
+            json.dumps(initial_result)
+        )
+
+        # Queue the task for background execution. The arguments are kept so
+        # the lease sweeper can re-queue the task if its worker dies.
+        payload = {
+            "submission_id": submission_id,
+            "source_code": submission.source_code,
+            "stdin_data": submission.stdin_data,
+            "stdin_ref": submission.stdin_ref,
+            "time_limit_sec": submission.time_limit_sec,
+            "memory_limit_mb": submission.memory_limit_mb,
+            "cpu_cores": submission.cpu_cores,
+            "lang": submission.lang,
+            "debug": submission.debug,
+            "traceparent": trace.traceparent,
+            "interactor_source": submission.interactor_source,
+            "interactor_lang": submission.interactor_lang,
+        }
+        store_payload(redis_client, submission_id, payload)
+
+        # Prefer a node that already has the runtime images and a free slot
+        langs = [submission.lang]
+        if submission.interactor_source:
+            langs.append(submission.interactor_lang)
+        dispatch(payload, langs, task_id=submission_id)
     
     return SubmissionResponse(
         submission_id=submission_id,
@@ -105,3 +150,20 @@ def delete_result(submission_id: str):
     
     return {"message": f"Submission {submission_id} deleted successfully"}
 
+
+
+@app.get("/metrics/reaper")
+def get_reaper_metrics():
+    """
+    Counts of leaked sandbox containers and workspaces removed by worker reapers.
+    """
+    metrics = redis_client.hgetall("metrics:reaper")
+    return {key.decode(): int(value) for key, value in metrics.items()}
+
+
+@app.get("/workers")
+def get_workers():
+    """
+    Live worker nodes with their free sandbox slots, cached images and languages.
+    """
+    return live_workers(redis_client)
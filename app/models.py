@@ -1,13 +1,50 @@
-from pydantic import BaseModel
-from typing import Optional, Literal
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import Optional, Literal, Dict
+
+from app.services.runtimes import RUNTIMES
+from app.services.executor import worst_case_sec
+from tasks.celery_app import TASK_SOFT_TIME_LIMIT_SEC
 
 class CodeSubmission(BaseModel):
     source_code: str
     stdin_data: str = ""
-    time_limit_sec: float = 2.0
-    memory_limit_mb: int = 256
-    cpu_cores: float = 1.0
+    # ID of an input uploaded via /submissions/inputs, used instead of stdin_data
+    stdin_ref: Optional[str] = None
+    # Limits default to the language runtime's configured values
+    time_limit_sec: Optional[float] = Field(None, gt=0)
+    memory_limit_mb: Optional[int] = None
+    cpu_cores: Optional[float] = None
     lang: str = "python"
+    debug: bool = False  # Include a per-phase timing breakdown in the result
+    # Interactive problems: the interactor talks to the program over stdin/stdout
+    # and receives stdin_data as its test file
+    interactor_source: Optional[str] = None
+    interactor_lang: str = "cpp"
+
+    @field_validator("lang", "interactor_lang")
+    @classmethod
+    def lang_must_be_supported(cls, value: str) -> str:
+        if value not in RUNTIMES:
+            raise ValueError(f"unsupported language, expected one of: {', '.join(sorted(RUNTIMES))}")
+        return value
+
+    @model_validator(mode="after")
+    def limits_must_fit_task(self) -> "CodeSubmission":
+        # A task killed by Celery's time limit leaves no verdict, so reject
+        # limits that could not finish on the slowest calibrated host
+        interactor = RUNTIMES[self.interactor_lang] if self.interactor_source else None
+        needed = worst_case_sec(RUNTIMES[self.lang], self.time_limit_sec, interactor)
+        if needed > TASK_SOFT_TIME_LIMIT_SEC:
+            raise ValueError(
+                f"time limit too large: compile and run may take up to {needed:.1f}s "
+                f"on a slow worker, over the {TASK_SOFT_TIME_LIMIT_SEC}s task limit"
+            )
+        return self
+
+class InputUploadResponse(BaseModel):
+    input_id: str
+    sha256: str
+    size_bytes: int
 
 class SubmissionResponse(BaseModel):
     submission_id: str
@@ -15,8 +52,9 @@ class SubmissionResponse(BaseModel):
 
 class ExecutionResult(BaseModel):
     submission_id: str
-    status: Literal["PENDING", "PROCESSING", "OK", "TLE", "RE", "INTERNAL_ERROR","CE"]
+    status: Literal["PENDING", "PROCESSING", "OK", "TLE", "RE", "WA", "INTERNAL_ERROR","CE"]
     stdout: Optional[str] = None
     stderr: Optional[str] = None
     exit_code: Optional[int] = None
     time_sec: Optional[float] = None
+    timings: Optional[Dict[str, float]] = None
@@ -0,0 +1,65 @@
+import os
+import time
+
+# Time limits are defined against a reference host. Each worker times the same
+# fixed benchmark and derives a speed factor (> 1 means faster than reference),
+# which executors use to scale wall-clock limits and reported times.
+# Measure the reference value with `python -m app.services.calibration` on the
+# reference host; while it is unset every host uses a factor of 1.
+REFERENCE_BENCHMARK_SEC = float(os.getenv("OJ_CALIBRATION_REFERENCE_SEC", "0"))
+CALIBRATION_INTERVAL_SEC = float(os.getenv("OJ_CALIBRATION_INTERVAL_SEC", "600"))
+BENCHMARK_ROUNDS = 5
+MIN_SPEED_FACTOR = 0.25
+MAX_SPEED_FACTOR = 4.0
+
+
+def speed_key(node: str) -> str:
+    return f"worker:{node}:speed"
+
+
+def _workload() -> int:
+    # Integer arithmetic, allocation and hashing, roughly what judged programs do
+    total = 0
+    for i in range(200_000):
+        total = (total * 31 + i) % 1_000_003
+    values = [(i * 7919) % 10_007 for i in range(100_000)]
+    values.sort()
+    counts = {}
+    for value in values:
+        counts[value % 1000] = counts.get(value % 1000, 0) + 1
+    return total + len(counts)
+
+
+def run_benchmark(rounds: int = BENCHMARK_ROUNDS) -> float:
+    """Best-of-``rounds`` wall time of the benchmark, which filters out scheduler noise."""
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        _workload()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def calibrate(reference_sec: float = REFERENCE_BENCHMARK_SEC) -> float:
+    if reference_sec <= 0:
+        return 1.0
+    factor = reference_sec / run_benchmark()
+    return round(min(max(factor, MIN_SPEED_FACTOR), MAX_SPEED_FACTOR), 3)
+
+
+def slowest_speed_factor() -> float:
+    """Lowest factor a worker can report: 1 while calibration is disabled."""
+    return MIN_SPEED_FACTOR if REFERENCE_BENCHMARK_SEC > 0 else 1.0
+
+
+def store_speed_factor(redis_client, node: str, factor: float) -> None:
+    redis_client.set(speed_key(node), factor)
+
+
+def load_speed_factor(redis_client, node: str) -> float:
+    factor = redis_client.get(speed_key(node))
+    return float(factor) if factor else 1.0
+
+
+if __name__ == "__main__":
+    print(f"Benchmark: {run_benchmark():.4f}s")
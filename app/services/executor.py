@@ -1,26 +1,115 @@
 import os
-import tempfile
+import re
 import textwrap
 import time
-from typing import Literal, Dict, Any
+from datetime import datetime
+from typing import Literal, Dict, Any, List, Optional
 
 import docker
-from docker.errors import ContainerError, APIError
+from docker.errors import ContainerError, APIError, DockerException
+from requests.exceptions import RequestException
+
+from app.core.tracing import Trace
+from app.services.runtimes import Runtime, RUNTIMES
+from app.services import calibration
+from app.services.workspace import Workspace, WorkspaceQuotaExceeded, WORKSPACE_MAX_MB, SCRATCH_TMPFS_MB
+
+ResultStatus = Literal["OK", "TLE", "RE", "CE", "WA", "INTERNAL_ERROR"]
+
+# Sandboxes are labeled (and their workspaces prefixed) so the reaper can find
+# anything left behind by a worker that died before its cleanup ran.
+SANDBOX_LABEL = "oj.sandbox"
+DEADLINE_LABEL = "oj.deadline"
+SUBMISSION_LABEL = "oj.submission_id"
+REAPER_GRACE_SEC = float(os.getenv("OJ_REAPER_GRACE_SEC", "30"))
+
+# Runs that finish within this fraction over the time limit are reported as
+# borderline TLEs, which the task re-runs before finalizing the verdict.
+TLE_BORDERLINE_MARGIN = float(os.getenv("OJ_TLE_BORDERLINE_MARGIN", "0.2"))
+
+# Allowance for creating, starting and removing one sandbox container
+CONTAINER_OVERHEAD_SEC = 1.0
+
+# Failures talking to the Docker daemon say nothing about the submission, so
+# results caused by them are marked retryable.
+INFRA_ERRORS = (DockerException, RequestException)
+
+
+def sandbox_labels(submission_id: Optional[str], timeout_sec: float) -> Dict[str, str]:
+    """Labels marking a sandbox container and the time after which it is considered stale."""
+    return {
+        SANDBOX_LABEL: "1",
+        SUBMISSION_LABEL: submission_id or "",
+        DEADLINE_LABEL: str(int(time.time() + timeout_sec + REAPER_GRACE_SEC)),
+    }
+
+
+_DOCKER_TIME_RE = re.compile(r"^(.+T[\d:]+)(?:\.(\d+))?(Z|[+-]\d\d:\d\d)$")
+
+
+def docker_time(value: Optional[str]) -> Optional[float]:
+    """Parse a Docker RFC 3339 timestamp (nanosecond precision); None if unset."""
+    if not value or value.startswith("0001-01-01"):
+        return None
+    base, fraction, zone = _DOCKER_TIME_RE.match(value).groups()
+    seconds = datetime.fromisoformat(base + ("+00:00" if zone == "Z" else zone)).timestamp()
+    return seconds + float(f"0.{fraction}") if fraction else seconds
+
+
+def program_time_sec(state: Dict[str, Any]) -> float:
+    """How long the container's process ran, without Docker's create/start overhead."""
+    return docker_time(state["FinishedAt"]) - docker_time(state["StartedAt"])
+
+
+def worst_case_sec(
+    runtime: Runtime,
+    time_limit_sec: Optional[float] = None,
+    interactor_runtime: Optional[Runtime] = None,
+) -> float:
+    """
+    Longest a submission can keep a worker busy: every compile step at its limit
+    plus a run on the slowest host calibration allows. Only plain runs get the
+    borderline margin; interactive runs are cut off at the limit.
+    """
+    run_sec = (time_limit_sec or runtime.time_limit_sec) / calibration.slowest_speed_factor()
+    if interactor_runtime is None:
+        run_sec *= 1 + TLE_BORDERLINE_MARGIN
+        total = run_sec + CONTAINER_OVERHEAD_SEC
+    else:
+        total = run_sec + 2 * CONTAINER_OVERHEAD_SEC
+    for rt in (runtime, interactor_runtime):
+        if rt is not None and rt.compiled:
+            total += rt.compile_time_limit_sec + CONTAINER_OVERHEAD_SEC
+    return total
+
+
+class SandboxExecutor:
+    """
+    Runs a submission for any registered runtime: an optional compile step
+    followed by the run command with input.txt on stdin.
+    """
 
-ResultStatus = Literal["OK", "TLE", "RE", "CE", "INTERNAL_ERROR"]
-
-class PySandboxExecutor:
     def __init__(
         self,
-        image: str = "oj-python-runner",
-        time_limit_sec: float = 2.0,
-        memory_limit_mb: int = 256,
-        cpu_cores: float = 1.0,
+        runtime: Runtime,
+        image: Optional[str] = None,
+        time_limit_sec: Optional[float] = None,
+        memory_limit_mb: Optional[int] = None,
+        cpu_cores: Optional[float] = None,
+        compile_time_limit_sec: Optional[float] = None,
+        workspace_max_mb: int = WORKSPACE_MAX_MB,
+        speed_factor: float = 1.0,
     ):
-        self.image = image
-        self.time_limit_sec = time_limit_sec
-        self.memory_limit_mb = memory_limit_mb
-        self.cpu_cores = cpu_cores
+        self.runtime = runtime
+        self.image = image or runtime.image
+        self.time_limit_sec = time_limit_sec or runtime.time_limit_sec
+        self.memory_limit_mb = memory_limit_mb or runtime.memory_limit_mb
+        self.cpu_cores = cpu_cores or runtime.cpu_cores
+        self.compile_time_limit_sec = compile_time_limit_sec or runtime.compile_time_limit_sec
+        self.workspace_max_mb = workspace_max_mb
+        self.scratch_mb = runtime.scratch_mb or SCRATCH_TMPFS_MB
+        # Host speed relative to the reference host (see app.services.calibration)
+        self.speed_factor = speed_factor
 
         # Force correct socket to avoid http+docker issues
         self.client = docker.DockerClient(base_url="unix:///var/run/docker.sock")
@@ -29,212 +118,94 @@ class PySandboxExecutor:
         self,
         source_code: str,
         stdin_data: str = "",
+        trace: Optional[Trace] = None,
+        submission_id: Optional[str] = None,
+        stdin_path: Optional[str] = None,
     ) -> Dict[str, Any]:
+        """
+        ``stdin_path`` points at an uploaded input in shared storage; it is
+        mounted into the sandbox as input.txt in place of ``stdin_data``.
+        """
 
+        trace = trace or Trace(enabled=False)
         source_code = textwrap.dedent(source_code)
 
-        with tempfile.TemporaryDirectory() as tmpdir:
-            code_path = os.path.join(tmpdir, "main.py")
-            input_path = os.path.join(tmpdir, "input.txt")
-
-            with open(code_path, "w", encoding="utf-8") as f:
-                f.write(source_code)
-
-            # Write stdin data to a file
-            with open(input_path, "w", encoding="utf-8") as f:
+        with Workspace(max_mb=self.workspace_max_mb) as workspace:
+            with trace.span("workspace_setup"):
                 # Ensure input ends with newline
                 if stdin_data and not stdin_data.endswith('\n'):
                     stdin_data += '\n'
-                f.write(stdin_data)
-
-            volumes = {
-                tmpdir: {
-                    "bind": "/workspace",
-                    "mode": "rw",
-                }
-            }
-
-            # Use shell redirection to feed input
-            command = ["sh", "-c", "python main.py < input.txt"]
-
-            mem_limit = f"{self.memory_limit_mb}m"
-            nano_cpus = int(self.cpu_cores * 1_000_000_000)
-
-            start_time = time.time()
-            container = None
-
-            try:
-                container = self.client.containers.run(
-                    image=self.image,
-                    command=command,
-                    working_dir="/workspace",
-                    volumes=volumes,
-                    network_disabled=True,
-                    mem_limit=mem_limit,
-                    nano_cpus=nano_cpus,
-                    detach=True,
-                    stdout=True,
-                    stderr=True,
-                    tty=False,
-                )
-
-                # Poll container status
-                while True:
-                    container.reload()
-                    state = container.attrs["State"]
-                    if state["FinishedAt"] not in ("", None, "0001-01-01T00:00:00Z"):
-                        break
-
-                    if time.time() - start_time > self.time_limit_sec:
-                        container.kill()
-                        return {
-                            "status": "TLE",
-                            "stdout": "",
-                            "stderr": "",
-                            "exit_code": None,
-                            "time_sec": round(time.time() - start_time, 4),
-                        }
-
-                    time.sleep(0.05)
-
-                exit_code = state["ExitCode"]
-                stdout_logs = container.logs(stdout=True, stderr=False).decode("utf-8", "replace")
-                stderr_logs = container.logs(stdout=False, stderr=True).decode("utf-8", "replace")
-
-                status = "OK" if exit_code == 0 else "RE"
-
-                return {
-                    "status": status,
-                    "stdout": stdout_logs,
-                    "stderr": stderr_logs,
-                    "exit_code": exit_code,
-                    "time_sec": round(time.time() - start_time, 4),
-                }
-
-            except Exception as e:
-                return {
-                    "status": "INTERNAL_ERROR",
-                    "stdout": "",
-                    "stderr": str(e),
-                    "exit_code": None,
-                    "time_sec": round(time.time() - start_time, 4),
-                }
-            finally:
-                if container is not None:
-                    try:
-                        container.remove(force=True)
-                    except:
-                        pass
-
-class CppSandboxExecutor:
-    def __init__(
-        self,
-        image: str = "oj-cpp-runner",
-        time_limit_sec: float = 2.0,
-        memory_limit_mb: int = 256,
-        cpu_cores: float = 1.0,
-        compile_time_limit_sec: float = 10.0,
-    ):
-        self.image = image
-        self.time_limit_sec = time_limit_sec
-        self.memory_limit_mb = memory_limit_mb
-        self.cpu_cores = cpu_cores
-        self.compile_time_limit_sec = compile_time_limit_sec
-
-        self.client = docker.DockerClient(base_url="unix:///var/run/docker.sock")
-
-    def run(
-        self,
-        source_code: str,
-        stdin_data: str = "",
-    ) -> Dict[str, Any]:
-
-        source_code = textwrap.dedent(source_code)
-
-        with tempfile.TemporaryDirectory() as tmpdir:
-            code_path = os.path.join(tmpdir, "main.cpp")
-            input_path = os.path.join(tmpdir, "input.txt")
-
-            with open(code_path, "w", encoding="utf-8") as f:
-                f.write(source_code)
-
-            # Write stdin data to a file
-            with open(input_path, "w", encoding="utf-8") as f:
-                if stdin_data and not stdin_data.endswith('\n'):
-                    stdin_data += '\n'
-                f.write(stdin_data)
-
-            volumes = {
-                tmpdir: {
-                    "bind": "/workspace",
-                    "mode": "rw",
-                }
-            }
+                try:
+                    workspace.write(self.runtime.source_filename, source_code)
+                    if stdin_path:
+                        workspace.mount_input("input.txt", stdin_path)
+                    else:
+                        # Write stdin data to a file
+                        workspace.write("input.txt", stdin_data)
+                except WorkspaceQuotaExceeded as e:
+                    return {
+                        "status": "INTERNAL_ERROR",
+                        "stdout": "",
+                        "stderr": str(e),
+                        "exit_code": None,
+                        "time_sec": None,
+                    }
 
             mem_limit = f"{self.memory_limit_mb}m"
             nano_cpus = int(self.cpu_cores * 1_000_000_000)
 
-            # Step 1: Compile the C++ code
-            compile_result = self._compile(volumes, mem_limit, nano_cpus)
-            if compile_result["status"] != "OK":
-                return compile_result
+            # Step 1: Compile, for languages that need it
+            if self.runtime.compiled:
+                with trace.span("compile"):
+                    compile_result = self._compile(workspace, mem_limit, nano_cpus, trace, submission_id)
+                if compile_result["status"] != "OK":
+                    return compile_result
 
-            # Step 2: Execute the compiled binary
-            return self._execute(volumes, mem_limit, nano_cpus)
+            # Step 2: Run the program
+            with trace.span("execute"):
+                return self._execute(workspace, mem_limit, nano_cpus, trace, submission_id)
 
     def _compile(
         self,
-        volumes: Dict,
+        workspace: Workspace,
         mem_limit: str,
         nano_cpus: int,
+        trace: Trace,
+        submission_id: Optional[str] = None,
     ) -> Dict[str, Any]:
-        """Compile the C++ source code."""
-        
-        # Compile command: g++ with optimizations and warnings
-        compile_command = [
-            "sh", "-c",
-            "g++ -O2 -std=c++17 -o main main.cpp 2>&1"
-        ]
+        """Compile the source code in the workspace."""
+
+        compile_command = ["sh", "-c", workspace.compile_command(self.runtime.compile_command)]
+
+        # The compiler writes to a capped tmpfs, never to the workspace directly
+        volumes = workspace.compile_volumes()
 
         start_time = time.time()
         container = None
 
         try:
-            container = self.client.containers.run(
-                image=self.image,
-                command=compile_command,
-                working_dir="/workspace",
-                volumes=volumes,
-                network_disabled=True,
-                mem_limit=mem_limit,
-                nano_cpus=nano_cpus,
-                detach=True,
-                stdout=True,
-                stderr=True,
-                tty=False,
-            )
+            with trace.span("compile.container_start", image=self.image):
+                container = self._start_container(
+                    compile_command, volumes, mem_limit, nano_cpus,
+                    self.compile_time_limit_sec, submission_id,
+                    tmpfs=workspace.compile_tmpfs(self.scratch_mb),
+                )
 
             # Poll container status for compilation
-            while True:
-                container.reload()
-                state = container.attrs["State"]
-                if state["FinishedAt"] not in ("", None, "0001-01-01T00:00:00Z"):
-                    break
-
-                if time.time() - start_time > self.compile_time_limit_sec:
-                    container.kill()
-                    return {
-                        "status": "CE",
-                        "stdout": "",
-                        "stderr": "Compilation timed out",
-                        "exit_code": None,
-                        "time_sec": round(time.time() - start_time, 4),
-                    }
-
-                time.sleep(0.05)
+            with trace.span("compile.poll"):
+                state = self._wait(container, start_time, self.compile_time_limit_sec)
+            if state is None:
+                return {
+                    "status": "CE",
+                    "stdout": "",
+                    "stderr": "Compilation timed out",
+                    "exit_code": None,
+                    "time_sec": round(time.time() - start_time, 4),
+                }
 
             exit_code = state["ExitCode"]
-            output = container.logs(stdout=True, stderr=True).decode("utf-8", "replace")
+            with trace.span("compile.log_fetch"):
+                output = self._read_logs(container, stdout=True, stderr=True)
 
             if exit_code != 0:
                 return {
@@ -245,6 +216,17 @@ class CppSandboxExecutor:
                     "time_sec": round(time.time() - start_time, 4),
                 }
 
+            try:
+                workspace.check_quota()
+            except WorkspaceQuotaExceeded as e:
+                return {
+                    "status": "CE",
+                    "stdout": "",
+                    "stderr": str(e),
+                    "exit_code": exit_code,
+                    "time_sec": round(time.time() - start_time, 4),
+                }
+
             return {
                 "status": "OK",
                 "compile_time_sec": round(time.time() - start_time, 4),
@@ -257,65 +239,75 @@ class CppSandboxExecutor:
                 "stderr": f"Compilation error: {str(e)}",
                 "exit_code": None,
                 "time_sec": round(time.time() - start_time, 4),
+                "retryable": isinstance(e, INFRA_ERRORS),
             }
         finally:
             if container is not None:
-                try:
-                    container.remove(force=True)
-                except:
-                    pass
+                with trace.span("compile.container_remove"):
+                    try:
+                        container.remove(force=True)
+                    except:
+                        pass
 
     def _execute(
         self,
-        volumes: Dict,
+        workspace: Workspace,
         mem_limit: str,
         nano_cpus: int,
+        trace: Trace,
+        submission_id: Optional[str] = None,
     ) -> Dict[str, Any]:
-        """Execute the compiled binary."""
-        
-        # Execute with input redirection
-        execute_command = ["sh", "-c", "./main < input.txt"]
+        """Run the program with input.txt on stdin."""
+
+        # Use shell redirection to feed input
+        execute_command = ["sh", "-c", f"{self.runtime.run_command} < input.txt"]
+
+        # The program only reads its workspace; scratch writes go to a capped tmpfs
+        volumes = workspace.volumes(mode="ro")
+
+        # Limits are for the reference host: slower hosts get proportionally more
+        # time, plus a margin so near misses can be told from clear TLEs. Only
+        # the program's own run time is scaled (see _wait)
+        wall_limit_sec = self.time_limit_sec / self.speed_factor * (1 + TLE_BORDERLINE_MARGIN)
 
         start_time = time.time()
         container = None
 
         try:
-            container = self.client.containers.run(
-                image=self.image,
-                command=execute_command,
-                working_dir="/workspace",
-                volumes=volumes,
-                network_disabled=True,
-                mem_limit=mem_limit,
-                nano_cpus=nano_cpus,
-                detach=True,
-                stdout=True,
-                stderr=True,
-                tty=False,
-            )
+            with trace.span("execute.container_start", image=self.image):
+                container = self._start_container(
+                    execute_command, volumes, mem_limit, nano_cpus,
+                    wall_limit_sec, submission_id,
+                )
 
             # Poll container status for execution
-            while True:
-                container.reload()
-                state = container.attrs["State"]
-                if state["FinishedAt"] not in ("", None, "0001-01-01T00:00:00Z"):
-                    break
-
-                if time.time() - start_time > self.time_limit_sec:
-                    container.kill()
-                    return {
-                        "status": "TLE",
-                        "stdout": "",
-                        "stderr": "",
-                        "exit_code": None,
-                        "time_sec": round(time.time() - start_time, 4),
-                    }
+            with trace.span("execute.poll"):
+                state = self._wait(container, start_time, wall_limit_sec)
+            if state is None:
+                return {
+                    "status": "TLE",
+                    "stdout": "",
+                    "stderr": "",
+                    "exit_code": None,
+                    "time_sec": self._normalized_time(wall_limit_sec),
+                }
 
-                time.sleep(0.05)
+            # Reported times are normalized to the reference host
+            time_sec = self._normalized_time(program_time_sec(state))
+            if time_sec > self.time_limit_sec:
+                return {
+                    "status": "TLE",
+                    "stdout": "",
+                    "stderr": "",
+                    "exit_code": None,
+                    "time_sec": time_sec,
+                    "borderline": True,
+                }
 
             exit_code = state["ExitCode"]
-            stdout_logs = container.logs(stdout=True, stderr=False).decode("utf-8", "replace")
-            stderr_logs = container.logs(stdout=False, stderr=True).decode("utf-8", "replace")
+            with trace.span("execute.log_fetch"):
+                stdout_logs = self._read_logs(container, stdout=True, stderr=False)
+                stderr_logs = self._read_logs(container, stdout=False, stderr=True)
 
             status = "OK" if exit_code == 0 else "RE"
 
@@ -324,7 +316,7 @@ class CppSandboxExecutor:
                 "stdout": stdout_logs,
                 "stderr": stderr_logs,
                 "exit_code": exit_code,
-                "time_sec": round(time.time() - start_time, 4),
+                "time_sec": time_sec,
             }
 
         except Exception as e:
@@ -334,10 +326,138 @@ class CppSandboxExecutor:
                 "stderr": str(e),
                 "exit_code": None,
                 "time_sec": round(time.time() - start_time, 4),
+                "retryable": isinstance(e, INFRA_ERRORS),
             }
         finally:
             if container is not None:
-                try:
-                    container.remove(force=True)
-                except:
-                    pass
\ No newline at end of file
+                with trace.span("execute.container_remove"):
+                    try:
+                        container.remove(force=True)
+                    except:
+                        pass
+
+    def _container_kwargs(
+        self,
+        command: List[str],
+        volumes: Dict,
+        mem_limit: str,
+        nano_cpus: int,
+        timeout_sec: float,
+        submission_id: Optional[str],
+        tmpfs: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        """Sandbox settings shared by every container this executor creates."""
+        return dict(
+            image=self.image,
+            command=command,
+            working_dir="/workspace",
+            volumes=volumes,
+            tmpfs=tmpfs or Workspace.scratch_tmpfs(self.scratch_mb),
+            environment=self.runtime.env,
+            network_disabled=True,
+            mem_limit=mem_limit,
+            nano_cpus=nano_cpus,
+            tty=False,
+            labels=sandbox_labels(submission_id, timeout_sec),
+        )
+
+    def _start_container(
+        self,
+        command: List[str],
+        volumes: Dict,
+        mem_limit: str,
+        nano_cpus: int,
+        timeout_sec: float,
+        submission_id: Optional[str],
+        tmpfs: Optional[Dict[str, str]] = None,
+    ):
+        return self.client.containers.run(
+            detach=True,
+            stdout=True,
+            stderr=True,
+            **self._container_kwargs(command, volumes, mem_limit, nano_cpus, timeout_sec, submission_id, tmpfs),
+        )
+
+    def _normalized_time(self, elapsed_sec: float) -> float:
+        return round(elapsed_sec * self.speed_factor, 4)
+
+    def _wait(self, container, start_time: float, timeout_sec: float) -> Optional[Dict[str, Any]]:
+        """
+        Poll until the container finishes; kill it and return None once the
+        timeout is hit. The timeout runs from the process start; until Docker
+        reports one, container start-up gets a fixed, unscaled allowance.
+        """
+        while True:
+            container.reload()
+            state = container.attrs["State"]
+            if docker_time(state["FinishedAt"]) is not None:
+                return state
+
+            started = docker_time(state.get("StartedAt")) or start_time + CONTAINER_OVERHEAD_SEC
+            if time.time() - started > timeout_sec:
+                container.kill()
+                return None
+
+            time.sleep(0.05)
+
+    def _read_logs(self, container, stdout: bool, stderr: bool) -> str:
+        """Stream container logs, stopping once the runtime's output cap is reached."""
+        limit = self.runtime.max_output_bytes
+        chunks = []
+        size = 0
+        # Closed explicitly: leaving the loop early would otherwise keep the
+        # HTTP connection to the Docker daemon open until garbage collection
+        stream = container.logs(stdout=stdout, stderr=stderr, stream=True, follow=False)
+        try:
+            for chunk in stream:
+                chunks.append(chunk[:max(limit - size, 0)])
+                size += len(chunk)
+                if size > limit:
+                    break
+        finally:
+            stream.close()
+
+        output = b"".join(chunks).decode("utf-8", "replace")
+        if size > limit:
+            output += f"\n[output truncated at {limit} bytes]"
+        return output
+
+
+class PySandboxExecutor(SandboxExecutor):
+    def __init__(
+        self,
+        image: str = "oj-python-runner",
+        time_limit_sec: float = 2.0,
+        memory_limit_mb: int = 256,
+        cpu_cores: float = 1.0,
+        workspace_max_mb: int = WORKSPACE_MAX_MB,
+    ):
+        super().__init__(
+            RUNTIMES["python"],
+            image=image,
+            time_limit_sec=time_limit_sec,
+            memory_limit_mb=memory_limit_mb,
+            cpu_cores=cpu_cores,
+            workspace_max_mb=workspace_max_mb,
+        )
+
+
+class CppSandboxExecutor(SandboxExecutor):
+    def __init__(
+        self,
+        image: str = "oj-cpp-runner",
+        time_limit_sec: float = 2.0,
+        memory_limit_mb: int = 256,
+        cpu_cores: float = 1.0,
+        compile_time_limit_sec: Optional[float] = None,
+        workspace_max_mb: int = WORKSPACE_MAX_MB,
+    ):
+        super().__init__(
+            RUNTIMES["cpp"],
+            image=image,
+            time_limit_sec=time_limit_sec,
+            memory_limit_mb=memory_limit_mb,
+            cpu_cores=cpu_cores,
+            compile_time_limit_sec=compile_time_limit_sec,
+            workspace_max_mb=workspace_max_mb,
+        )
@@ -0,0 +1,154 @@
+import json
+import os
+import socket
+import time
+from typing import Any, Dict, List, Optional
+
+import docker
+
+from app.services.runtimes import RUNTIMES
+
+# Each worker node advertises its capacity under worker:{node}. The key expires
+# unless refreshed, so nodes that die simply drop out of dispatch.
+NODE_NAME = os.getenv("OJ_NODE_NAME", socket.gethostname())
+HEARTBEAT_INTERVAL_SEC = float(os.getenv("OJ_HEARTBEAT_INTERVAL_SEC", "5"))
+HEARTBEAT_TTL_SEC = int(HEARTBEAT_INTERVAL_SEC * 3)
+WORKERS_KEY = "workers"
+# Each running task claims a slot under its own key. The claim outlives the
+# Celery hard time limit and expires on its own, so a pool child killed before
+# task_postrun fires cannot leak a slot.
+SLOT_TTL_SEC = int(os.getenv("OJ_SLOT_TTL_SEC", "60"))
+
+
+def node_queue(node: str) -> str:
+    """Queue consumed only by ``node``, used to route work to a specific host."""
+    return f"node.{node}"
+
+
+def worker_key(node: str) -> str:
+    return f"worker:{node}"
+
+
+def slot_key(node: str, task_id: str) -> str:
+    return f"worker:{node}:active:{task_id}"
+
+
+def claim_slot(redis_client, node: str, task_id: str) -> None:
+    redis_client.setex(slot_key(node, task_id), SLOT_TTL_SEC, "1")
+
+
+def free_slot(redis_client, node: str, task_id: str) -> None:
+    redis_client.delete(slot_key(node, task_id))
+
+
+def active_slots(redis_client, node: str) -> int:
+    """Number of sandbox tasks running on ``node``."""
+    return sum(1 for _ in redis_client.scan_iter(match=slot_key(node, "*")))
+
+
+def clear_slots(redis_client, node: str) -> None:
+    keys = list(redis_client.scan_iter(match=slot_key(node, "*")))
+    if keys:
+        redis_client.delete(*keys)
+
+
+def cached_images(client: docker.DockerClient) -> List[str]:
+    """Runtime images already present on this Docker host."""
+    images = []
+    for image in sorted({runtime.image for runtime in RUNTIMES.values()}):
+        try:
+            client.images.get(image)
+            images.append(image)
+        except docker.errors.ImageNotFound:
+            pass
+    return images
+
+
+def prepare_images(client: docker.DockerClient) -> List[str]:
+    """
+    Pull missing runtime images and start one throwaway container per image so
+    the first real submission does not pay for image download and layer setup.
+    Returns the images that are ready to use.
+    """
+    ready = []
+    for image in sorted({runtime.image for runtime in RUNTIMES.values()}):
+        try:
+            try:
+                client.images.get(image)
+            except docker.errors.ImageNotFound:
+                print("Pulling runtime image:", image)
+                client.images.pull(image)
+            client.containers.run(
+                image=image,
+                command=["true"],
+                network_disabled=True,
+                remove=True,
+            )
+            ready.append(image)
+        except docker.errors.DockerException as e:
+            # Locally built images (oj-*-runner) cannot be pulled; skip them
+            # here and let the heartbeat report the node without them
+            print(f"Could not prepare image {image}:", e)
+    return ready
+
+
+def publish_heartbeat(
+    redis_client,
+    node: str,
+    total_slots: int,
+    images: List[str],
+    speed_factor: float = 1.0,
+) -> Dict[str, Any]:
+    active = active_slots(redis_client, node)
+    languages = sorted(name for name, runtime in RUNTIMES.items() if runtime.image in images)
+    info = {
+        "node": node,
+        "queue": node_queue(node),
+        "total_slots": total_slots,
+        "free_slots": max(total_slots - active, 0),
+        "images": images,
+        "languages": languages,
+        "speed_factor": speed_factor,
+        "updated_at": time.time(),
+    }
+    pipe = redis_client.pipeline()
+    pipe.setex(worker_key(node), HEARTBEAT_TTL_SEC, json.dumps(info))
+    pipe.sadd(WORKERS_KEY, node)
+    pipe.execute()
+    return info
+
+
+def live_workers(redis_client) -> List[Dict[str, Any]]:
+    nodes = [member.decode() for member in redis_client.smembers(WORKERS_KEY)]
+    if not nodes:
+        return []
+
+    workers = []
+    for node, info in zip(nodes, redis_client.mget([worker_key(node) for node in nodes])):
+        if info is None:
+            # Heartbeat expired: the node is gone
+            redis_client.srem(WORKERS_KEY, node)
+            continue
+        workers.append(json.loads(info))
+    return workers
+
+
+def choose_queue(redis_client, langs: List[str]) -> Optional[str]:
+    """
+    Pick the node queue with the most free slots among nodes that already hold
+    the runtime images for all of ``langs``. Returns None when no node qualifies,
+    in which case the task goes to the shared default queue.
+    """
+    candidates = [
+        worker for worker in live_workers(redis_client)
+        if set(langs) <= set(worker["languages"]) and worker["free_slots"] > 0
+    ]
+    if not candidates:
+        return None
+    chosen = max(candidates, key=lambda worker: worker["free_slots"])
+
+    # Claim the slot in the advertised record so dispatches made before the
+    # node's next heartbeat spread out instead of piling onto the same node
+    chosen["free_slots"] -= 1
+    redis_client.set(worker_key(chosen["node"]), json.dumps(chosen), keepttl=True)
+    return chosen["queue"]
@@ -0,0 +1,351 @@
+import select
+import socket
+import struct
+import textwrap
+import time
+from typing import Any, Dict, Optional
+
+from app.core.tracing import Trace
+from app.services.executor import SandboxExecutor, INFRA_ERRORS, CONTAINER_OVERHEAD_SEC, program_time_sec
+from app.services.runtimes import Runtime
+from app.services.workspace import Workspace, WorkspaceQuotaExceeded, WORKSPACE_MAX_MB
+
+RELAY_CHUNK_BYTES = 64 * 1024
+# Per-direction backlog; once a side's stdin is this far behind we stop reading
+# from its peer, so a program that never reads cannot grow worker memory.
+RELAY_BUFFER_MAX_BYTES = 256 * 1024
+
+STDOUT_STREAM = 1
+# testlib interactor exit codes: 1 = wrong answer, 2 = presentation error
+INTERACTOR_REJECT_EXIT_CODES = (1, 2)
+# testlib's registerInteraction requires <input-file> <output-file>; the output
+# goes to the interactor's scratch tmpfs and is not used for the verdict
+INTERACTOR_OUTPUT_PATH = "/tmp/output.txt"
+
+
+def combined_verdict(contestant_exit: int, interactor_exit: int) -> str:
+    """The interactor's judgement wins; otherwise a crashing program is RE."""
+    if interactor_exit in INTERACTOR_REJECT_EXIT_CODES:
+        return "WA"
+    if contestant_exit != 0:
+        return "RE"
+    if interactor_exit != 0:
+        return "INTERNAL_ERROR"
+    return "OK"
+
+
+class _StdoutDemuxer:
+    """Strip Docker's stream multiplexing headers from an attached socket, keeping stdout."""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.eof = False
+        self._buffer = b""
+        self._stream = None
+        self._remaining = 0
+
+    def read(self) -> bytes:
+        try:
+            data = self.sock.recv(RELAY_CHUNK_BYTES)
+        except BlockingIOError:
+            return b""
+        if not data:
+            self.eof = True
+            return b""
+
+        self._buffer += data
+        out = []
+        while self._buffer:
+            if self._remaining == 0:
+                if len(self._buffer) < 8:
+                    break
+                self._stream = self._buffer[0]
+                self._remaining = struct.unpack(">L", self._buffer[4:8])[0]
+                self._buffer = self._buffer[8:]
+                continue
+            chunk = self._buffer[:self._remaining]
+            self._buffer = self._buffer[len(chunk):]
+            self._remaining -= len(chunk)
+            if self._stream == STDOUT_STREAM:
+                out.append(chunk)
+        return b"".join(out)
+
+
+class InteractiveExecutor:
+    """
+    Judges interactive problems: the contestant program and the interactor run
+    in separate sandboxes with each one's stdout relayed to the other's stdin.
+    The interactor is started testlib-style as ``<run> input.txt <output-file>``
+    with the test data in ``input.txt``, and decides the verdict with its exit code.
+    """
+
+    def __init__(
+        self,
+        runtime: Runtime,
+        interactor_runtime: Runtime,
+        time_limit_sec: Optional[float] = None,
+        memory_limit_mb: Optional[int] = None,
+        cpu_cores: Optional[float] = None,
+        workspace_max_mb: int = WORKSPACE_MAX_MB,
+        speed_factor: float = 1.0,
+    ):
+        self.contestant = SandboxExecutor(
+            runtime,
+            time_limit_sec=time_limit_sec,
+            memory_limit_mb=memory_limit_mb,
+            cpu_cores=cpu_cores,
+            workspace_max_mb=workspace_max_mb,
+            speed_factor=speed_factor,
+        )
+        self.interactor = SandboxExecutor(interactor_runtime, workspace_max_mb=workspace_max_mb)
+        # Both sides share the contestant's time limit, scaled to this host's speed
+        self.time_limit_sec = self.contestant.time_limit_sec / speed_factor
+        self.client = self.contestant.client
+
+    def run(
+        self,
+        source_code: str,
+        interactor_source: str,
+        stdin_data: str = "",
+        trace: Optional[Trace] = None,
+        submission_id: Optional[str] = None,
+        stdin_path: Optional[str] = None,
+    ) -> Dict[str, Any]:
+
+        trace = trace or Trace(enabled=False)
+
+        with Workspace(max_mb=self.contestant.workspace_max_mb) as contestant_ws, \
+                Workspace(max_mb=self.interactor.workspace_max_mb) as interactor_ws:
+            with trace.span("workspace_setup"):
+                try:
+                    contestant_ws.write(self.contestant.runtime.source_filename, textwrap.dedent(source_code))
+                    interactor_ws.write(self.interactor.runtime.source_filename, textwrap.dedent(interactor_source))
+                    if stdin_path:
+                        interactor_ws.mount_input("input.txt", stdin_path)
+                    else:
+                        interactor_ws.write("input.txt", stdin_data)
+                except WorkspaceQuotaExceeded as e:
+                    return {
+                        "status": "INTERNAL_ERROR",
+                        "stdout": "",
+                        "stderr": str(e),
+                        "exit_code": None,
+                        "time_sec": None,
+                    }
+
+            if self.interactor.runtime.compiled:
+                with trace.span("interactor.compile"):
+                    compile_result = self._compile(self.interactor, interactor_ws, trace, submission_id)
+                if compile_result["status"] != "OK":
+                    # A broken interactor is the problem setter's fault, not the contestant's
+                    compile_result["status"] = "INTERNAL_ERROR"
+                    compile_result["stderr"] = f"Interactor compilation failed: {compile_result['stderr']}"
+                    return compile_result
+
+            if self.contestant.runtime.compiled:
+                with trace.span("compile"):
+                    compile_result = self._compile(self.contestant, contestant_ws, trace, submission_id)
+                if compile_result["status"] != "OK":
+                    return compile_result
+
+            with trace.span("interact"):
+                return self._interact(contestant_ws, interactor_ws, trace, submission_id)
+
+    def _compile(
+        self,
+        executor: SandboxExecutor,
+        workspace: Workspace,
+        trace: Trace,
+        submission_id: Optional[str],
+    ) -> Dict[str, Any]:
+        mem_limit = f"{executor.memory_limit_mb}m"
+        nano_cpus = int(executor.cpu_cores * 1_000_000_000)
+        return executor._compile(workspace, mem_limit, nano_cpus, trace, submission_id)
+
+    def _create_container(
+        self,
+        executor: SandboxExecutor,
+        command: str,
+        workspace: Workspace,
+        submission_id: Optional[str],
+    ):
+        kwargs = executor._container_kwargs(
+            ["sh", "-c", command],
+            workspace.volumes(mode="ro"),
+            f"{executor.memory_limit_mb}m",
+            int(executor.cpu_cores * 1_000_000_000),
+            self.time_limit_sec,
+            submission_id,
+        )
+        # StdinOnce makes Docker close the process's stdin when our attach stream
+        # half-closes, which is how EOF reaches a side whose peer has exited.
+        # docker-py has no stdin_once argument; it sets StdinOnce for
+        # stdin_open=True containers created with detach=False.
+        container = self.client.containers.create(stdin_open=True, detach=False, **kwargs)
+        if not container.attrs["Config"].get("StdinOnce"):
+            container.remove(force=True)
+            raise RuntimeError("Sandbox container was created without StdinOnce; EOF could not be relayed")
+        return container
+
+    def _interact(
+        self,
+        contestant_ws: Workspace,
+        interactor_ws: Workspace,
+        trace: Trace,
+        submission_id: Optional[str],
+    ) -> Dict[str, Any]:
+        start_time = time.time()
+        contestant = interactor = None
+        sockets = []
+
+        try:
+            with trace.span("interact.container_start"):
+                contestant = self._create_container(
+                    self.contestant, self.contestant.runtime.run_command, contestant_ws, submission_id,
+                )
+                interactor = self._create_container(
+                    self.interactor, f"{self.interactor.runtime.run_command} input.txt {INTERACTOR_OUTPUT_PATH}",
+                    interactor_ws, submission_id,
+                )
+
+                # Attach before starting so no early output is missed
+                for container in (contestant, interactor):
+                    attached = container.attach_socket(params={"stdin": 1, "stdout": 1, "stderr": 0, "stream": 1})
+                    sockets.append(getattr(attached, "_sock", attached))
+
+                start_time = time.time()
+                contestant.start()
+                interactor.start()
+
+            # Starting both containers gets a fixed allowance on top of the limit
+            deadline = start_time + self.time_limit_sec + 2 * CONTAINER_OVERHEAD_SEC
+            with trace.span("interact.relay"):
+                finished = self._relay(sockets[0], sockets[1], deadline)
+
+            if finished:
+                with trace.span("interact.poll"):
+                    contestant_state = self.contestant._wait(contestant, start_time, self.time_limit_sec)
+                    interactor_state = self.interactor._wait(interactor, start_time, self.time_limit_sec)
+            if not finished or contestant_state is None or interactor_state is None:
+                for container in (contestant, interactor):
+                    try:
+                        container.kill()
+                    except:
+                        pass
+                return {
+                    "status": "TLE",
+                    "stdout": "",
+                    "stderr": "",
+                    "exit_code": None,
+                    "time_sec": self.contestant._normalized_time(self.time_limit_sec),
+                }
+
+            time_sec = self.contestant._normalized_time(program_time_sec(contestant_state))
+            if time_sec > self.contestant.time_limit_sec:
+                return {
+                    "status": "TLE",
+                    "stdout": "",
+                    "stderr": "",
+                    "exit_code": None,
+                    "time_sec": time_sec,
+                }
+            contestant_exit = contestant_state["ExitCode"]
+            interactor_exit = interactor_state["ExitCode"]
+
+            with trace.span("interact.log_fetch"):
+                contestant_stderr = self.contestant._read_logs(contestant, stdout=False, stderr=True)
+                interactor_stderr = self.interactor._read_logs(interactor, stdout=False, stderr=True)
+
+            status = combined_verdict(contestant_exit, interactor_exit)
+            if status == "WA":
+                stderr = interactor_stderr
+            elif status == "INTERNAL_ERROR":
+                stderr = f"Interactor failed with exit code {interactor_exit}: {interactor_stderr}"
+            else:
+                stderr = contestant_stderr
+
+            return {
+                "status": status,
+                "stdout": "",
+                "stderr": stderr,
+                "exit_code": contestant_exit,
+                "time_sec": time_sec,
+            }
+
+        except Exception as e:
+            return {
+                "status": "INTERNAL_ERROR",
+                "stdout": "",
+                "stderr": str(e),
+                "exit_code": None,
+                "time_sec": round(time.time() - start_time, 4),
+                "retryable": isinstance(e, INFRA_ERRORS),
+            }
+        finally:
+            for sock in sockets:
+                try:
+                    sock.close()
+                except:
+                    pass
+            with trace.span("interact.container_remove"):
+                for container in (contestant, interactor):
+                    if container is not None:
+                        try:
+                            container.remove(force=True)
+                        except:
+                            pass
+
+    @staticmethod
+    def _relay(contestant_sock: socket.socket, interactor_sock: socket.socket, deadline: float) -> bool:
+        """
+        Pump each side's stdout into the other side's stdin until both close
+        their stdout. Returns False if the deadline passed first.
+        """
+        peer = {contestant_sock: interactor_sock, interactor_sock: contestant_sock}
+        readers = {sock: _StdoutDemuxer(sock) for sock in peer}
+        pending = {sock: bytearray() for sock in peer}  # bytes waiting for this socket's stdin
+        write_closed = {sock: False for sock in peer}
+
+        for sock in peer:
+            sock.setblocking(False)
+
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+
+            rlist = [
+                sock for sock in peer
+                if not readers[sock].eof and len(pending[peer[sock]]) < RELAY_BUFFER_MAX_BYTES
+            ]
+            wlist = [sock for sock in peer if pending[sock] and not write_closed[sock]]
+            if not rlist and not wlist:
+                return True
+
+            readable, writable, _ = select.select(rlist, wlist, [], min(remaining, 0.5))
+
+            for sock in writable:
+                try:
+                    sent = sock.send(pending[sock])
+                    del pending[sock][:sent]
+                except BlockingIOError:
+                    pass
+                except OSError:
+                    # The receiving side exited; whatever it did not read is dropped
+                    pending[sock].clear()
+                    write_closed[sock] = True
+
+            for sock in readable:
+                data = readers[sock].read()
+                if data and not write_closed[peer[sock]]:
+                    pending[peer[sock]].extend(data)
+
+            # Propagate EOF once everything a side wrote has been delivered
+            for sock in peer:
+                target = peer[sock]
+                if readers[sock].eof and not pending[target] and not write_closed[target]:
+                    try:
+                        target.shutdown(socket.SHUT_WR)
+                    except OSError:
+                        pass
+                    write_closed[target] = True
@@ -0,0 +1,111 @@
+import os
+import shutil
+import time
+from typing import Dict, Optional
+
+import docker
+
+from app.services.executor import SANDBOX_LABEL, DEADLINE_LABEL
+from app.services.workspace import WORKSPACE_ROOT, WORKSPACE_PREFIX
+from app.services.input_storage import INPUT_STORAGE_DIR, INPUT_VERIFIED_DIR
+
+# A workspace is only touched while its task runs, which is bounded by the
+# Celery hard time limit, so anything older than this is an orphan.
+WORKSPACE_MAX_AGE_SEC = float(os.getenv("OJ_WORKSPACE_MAX_AGE_SEC", "120"))
+# Uploaded inputs may be shared by several submissions, so they live longer
+INPUT_MAX_AGE_SEC = float(os.getenv("OJ_INPUT_MAX_AGE_SEC", "86400"))
+
+
+class SandboxReaper:
+    """Kill and remove sandbox containers and temp workspaces past their deadline."""
+
+    def __init__(
+        self,
+        client: Optional[docker.DockerClient] = None,
+        workspace_root: str = WORKSPACE_ROOT,
+        workspace_max_age_sec: float = WORKSPACE_MAX_AGE_SEC,
+    ):
+        self.client = client or docker.DockerClient(base_url="unix:///var/run/docker.sock")
+        self.workspace_root = workspace_root
+        self.workspace_max_age_sec = workspace_max_age_sec
+
+    def reap_containers(self, now: Optional[float] = None) -> int:
+        now = now or time.time()
+        reaped = 0
+        containers = self.client.containers.list(all=True, filters={"label": SANDBOX_LABEL})
+        for container in containers:
+            try:
+                deadline = float(container.labels.get(DEADLINE_LABEL, "0"))
+            except ValueError:
+                deadline = 0.0
+            if deadline > now:
+                continue
+            try:
+                container.remove(force=True)
+                reaped += 1
+            except docker.errors.NotFound:
+                # Removed by its own executor in the meantime
+                pass
+        return reaped
+
+    def reap_workspaces(self, now: Optional[float] = None) -> int:
+        now = now or time.time()
+        reaped = 0
+        try:
+            entries = os.scandir(self.workspace_root)
+        except FileNotFoundError:
+            return 0
+        with entries:
+            for entry in entries:
+                if not entry.name.startswith(WORKSPACE_PREFIX) or not entry.is_dir(follow_symlinks=False):
+                    continue
+                try:
+                    age = now - entry.stat(follow_symlinks=False).st_mtime
+                except FileNotFoundError:
+                    continue
+                if age < self.workspace_max_age_sec:
+                    continue
+                shutil.rmtree(entry.path, ignore_errors=True)
+                reaped += 1
+        return reaped
+
+    def reap_inputs(self, now: Optional[float] = None) -> int:
+        """
+        Delete uploaded inputs (and abandoned partial uploads) past their
+        retention, along with this node's verification markers for them.
+        """
+        now = now or time.time()
+        self._remove_old_files(INPUT_VERIFIED_DIR, now)
+        return self._remove_old_files(INPUT_STORAGE_DIR, now)
+
+    @staticmethod
+    def _remove_old_files(directory: str, now: float) -> int:
+        reaped = 0
+        try:
+            entries = os.scandir(directory)
+        except FileNotFoundError:
+            return 0
+        with entries:
+            for entry in entries:
+                try:
+                    age = now - entry.stat(follow_symlinks=False).st_mtime
+                except FileNotFoundError:
+                    continue
+                if age < INPUT_MAX_AGE_SEC or not entry.is_file(follow_symlinks=False):
+                    continue
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    # Another worker sharing the storage got there first
+                    continue
+                if not entry.name.endswith(".sha256"):
+                    reaped += 1
+        return reaped
+
+    def reap(self) -> Dict[str, int]:
+        now = time.time()
+        return {
+            "containers_reaped": self.reap_containers(now),
+            "workspaces_reaped": self.reap_workspaces(now),
+            "inputs_reaped": self.reap_inputs(now),
+        }
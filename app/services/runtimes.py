@@ -0,0 +1,83 @@
+import json
+import os
+from dataclasses import dataclass, field, fields
+from typing import Dict, Optional
+
+# Extra runtimes (Java, Go, Rust, ...) are declared in a JSON file mapping a
+# language name to Runtime fields; see docker/runtimes.example.json.
+RUNTIMES_FILE = os.getenv("OJ_RUNTIMES_FILE")
+
+
+class UnsupportedLanguage(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Runtime:
+    """Everything needed to build and run one language inside a sandbox image."""
+
+    name: str
+    image: str
+    source_filename: str
+    run_command: str
+    compile_command: Optional[str] = None
+    time_limit_sec: float = 2.0
+    memory_limit_mb: int = 256
+    cpu_cores: float = 1.0
+    compile_time_limit_sec: float = 10.0
+    max_output_bytes: int = 1024 * 1024
+    # Size of the sandbox's /tmp tmpfs; None uses OJ_SCRATCH_TMPFS_MB
+    scratch_mb: Optional[int] = None
+    env: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def compiled(self) -> bool:
+        return self.compile_command is not None
+
+
+BUILTIN_RUNTIMES: Dict[str, Runtime] = {
+    "python": Runtime(
+        name="python",
+        image="oj-python-runner",
+        source_filename="main.py",
+        run_command="python main.py",
+    ),
+    "cpp": Runtime(
+        name="cpp",
+        image="oj-cpp-runner",
+        source_filename="main.cpp",
+        compile_command="g++ -O2 -std=c++17 -o main main.cpp",
+        run_command="./main",
+        # Leaves room for contestant and interactor builds in one task
+        compile_time_limit_sec=6.0,
+    ),
+}
+
+
+def load_runtimes(path: Optional[str] = RUNTIMES_FILE) -> Dict[str, Runtime]:
+    runtimes = dict(BUILTIN_RUNTIMES)
+    if not path:
+        return runtimes
+
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    known = {f.name for f in fields(Runtime)}
+    for name, spec in config.items():
+        unknown = set(spec) - known
+        if unknown:
+            raise ValueError(f"Runtime {name!r} has unknown fields: {', '.join(sorted(unknown))}")
+        runtimes[name] = Runtime(**{**spec, "name": name})
+    return runtimes
+
+
+RUNTIMES = load_runtimes()
+
+
+def get_runtime(lang: str) -> Runtime:
+    try:
+        return RUNTIMES[lang]
+    except KeyError:
+        raise UnsupportedLanguage(
+            f"Unsupported language {lang!r}, expected one of: {', '.join(sorted(RUNTIMES))}"
+        ) from None
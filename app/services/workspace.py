@@ -0,0 +1,122 @@
+import os
+import tempfile
+from typing import Dict
+
+# "disk" keeps workspaces in the host temp dir; "tmpfs" puts them on a RAM-backed
+# directory so source, input and compiled binaries never hit the worker's disk.
+WORKSPACE_BACKEND = os.getenv("OJ_WORKSPACE_BACKEND", "disk")
+WORKSPACE_ROOT = os.getenv("OJ_WORKSPACE_ROOT") or (
+    "/dev/shm" if WORKSPACE_BACKEND == "tmpfs" else tempfile.gettempdir()
+)
+WORKSPACE_PREFIX = "oj-sandbox-"
+WORKSPACE_MAX_MB = int(os.getenv("OJ_WORKSPACE_MAX_MB", "64"))
+SCRATCH_TMPFS_MB = int(os.getenv("OJ_SCRATCH_TMPFS_MB", "16"))
+# Where the workspace directory is mounted while compiling
+COMPILE_EXPORT_DIR = "/export"
+
+
+class WorkspaceQuotaExceeded(Exception):
+    pass
+
+
+class Workspace:
+    """
+    Per-submission directory bind-mounted into the sandbox at /workspace.
+
+    Writes made by the worker are checked against ``max_bytes``. The sandbox
+    never writes to the directory directly: the compiler works in a tmpfs capped
+    at ``max_bytes`` and its results are copied back (see ``compile_tmpfs``),
+    and the program gets a size-limited tmpfs at /tmp for scratch files.
+    """
+
+    def __init__(self, max_mb: int = WORKSPACE_MAX_MB, root: str = WORKSPACE_ROOT):
+        self.max_bytes = max_mb * 1024 * 1024
+        self.root = root
+        self._tmpdir = None
+        self.path = None
+        self._mounted_inputs: Dict[str, str] = {}
+
+    def __enter__(self) -> "Workspace":
+        os.makedirs(self.root, exist_ok=True)
+        self._tmpdir = tempfile.TemporaryDirectory(prefix=WORKSPACE_PREFIX, dir=self.root)
+        self.path = self._tmpdir.name
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._tmpdir.cleanup()
+
+    def usage(self) -> int:
+        total = 0
+        for dirpath, _, filenames in os.walk(self.path):
+            for name in filenames:
+                try:
+                    total += os.lstat(os.path.join(dirpath, name)).st_size
+                except FileNotFoundError:
+                    pass
+        return total
+
+    def check_quota(self) -> None:
+        used = self.usage()
+        if used > self.max_bytes:
+            raise WorkspaceQuotaExceeded(
+                f"Workspace uses {used} bytes, limit is {self.max_bytes} bytes"
+            )
+
+    def write(self, name: str, data: str) -> None:
+        encoded = data.encode("utf-8")
+        if self.usage() + len(encoded) > self.max_bytes:
+            raise WorkspaceQuotaExceeded(
+                f"Writing {name} ({len(encoded)} bytes) exceeds workspace limit of {self.max_bytes} bytes"
+            )
+        with open(os.path.join(self.path, name), "wb") as f:
+            f.write(encoded)
+
+    def mount_input(self, name: str, source_path: str) -> None:
+        """
+        Expose a stored input file read-only at ``name`` without copying it. An
+        empty placeholder gives Docker an existing mountpoint inside the workspace.
+        """
+        open(os.path.join(self.path, name), "wb").close()
+        self._mounted_inputs[name] = source_path
+
+    def volumes(self, mode: str = "ro") -> Dict[str, Dict[str, str]]:
+        volumes = {
+            self.path: {
+                "bind": "/workspace",
+                "mode": mode,
+            }
+        }
+        for name, source_path in self._mounted_inputs.items():
+            volumes[source_path] = {
+                "bind": f"/workspace/{name}",
+                "mode": "ro",
+            }
+        return volumes
+
+    def compile_volumes(self) -> Dict[str, Dict[str, str]]:
+        """Mount the workspace outside the compiler's working directory."""
+        return {self.path: {"bind": COMPILE_EXPORT_DIR, "mode": "rw"}}
+
+    def compile_tmpfs(self, scratch_mb: int = SCRATCH_TMPFS_MB) -> Dict[str, str]:
+        """
+        Build in a tmpfs at /workspace sized to the workspace cap, so the kernel
+        stops a compiler that writes too much. Once the compiler is done, only
+        that much can be copied back to the host.
+        """
+        return {
+            "/workspace": f"rw,exec,nosuid,size={self.max_bytes // 1024}k",
+            **self.scratch_tmpfs(scratch_mb),
+        }
+
+    @staticmethod
+    def compile_command(command: str) -> str:
+        """Wrap ``command`` to copy sources into the tmpfs and results back out."""
+        return (
+            f"cp -R {COMPILE_EXPORT_DIR}/. /workspace/ && "
+            f"{{ {command} ; }} 2>&1 && "
+            f"cp -R /workspace/. {COMPILE_EXPORT_DIR}/"
+        )
+
+    @staticmethod
+    def scratch_tmpfs(size_mb: int = SCRATCH_TMPFS_MB) -> Dict[str, str]:
+        return {"/tmp": f"rw,noexec,nosuid,size={size_mb}m"}
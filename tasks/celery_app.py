@@ -5,6 +5,10 @@ import os
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 print("Celery Redis URL:", REDIS_URL)
 
+# Submission limits are validated against the soft limit (see app.models)
+TASK_TIME_LIMIT_SEC = 30
+TASK_SOFT_TIME_LIMIT_SEC = 25
+
 # Create Celery app
 celery_application = Celery(
     "online_judge",
@@ -14,13 +18,17 @@ celery_application = Celery(
 )
 
 celery_application.conf.update(
-    imports=['tasks.tasks'],
+    imports=['tasks.tasks', 'tasks.signals'],
     task_serializer="json",
     accept_content=["json"],
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
     task_track_started=True,
-    task_time_limit=30,  # Hard limit
-    task_soft_time_limit=25,  # Soft limit
+    task_time_limit=TASK_TIME_LIMIT_SEC,  # Hard limit
+    task_soft_time_limit=TASK_SOFT_TIME_LIMIT_SEC,  # Soft limit
+    task_acks_late=True,  # Ack only after the task finished, so a crashed worker's task is redelivered
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+    broker_transport_options={"visibility_timeout": 300},  # Must exceed the longest retry countdown
 )
@@ -0,0 +1,104 @@
+import json
+import os
+import time
+from typing import List, Optional
+
+# A worker holds a lease on a submission while executing it. The lease outlives
+# the Celery hard time limit, so an expired lease means the worker died and the
+# submission can safely be re-queued.
+LEASE_TTL_SEC = int(os.getenv("OJ_LEASE_TTL_SEC", "60"))
+LEASES_KEY = "leases"
+# A submission whose worker keeps dying (e.g. it takes the host down) is given
+# up on after this many re-queues instead of being retried forever
+MAX_SWEEPS = int(os.getenv("OJ_LEASE_MAX_SWEEPS", "3"))
+
+# Submissions routed to a node queue are tracked until they start. If the node
+# dies first, nothing else consumes its queue, so once this deadline passes the
+# sweeper re-dispatches them to the shared default queue.
+ROUTED_START_TIMEOUT_SEC = int(os.getenv("OJ_ROUTED_START_TIMEOUT_SEC", "30"))
+ROUTED_KEY = "routed"
+FINAL_STATUSES = ("OK", "TLE", "RE", "CE", "WA", "INTERNAL_ERROR")
+
+
+def lease_key(submission_id: str) -> str:
+    return f"lease:submission:{submission_id}"
+
+
+def payload_key(submission_id: str) -> str:
+    return f"submission:{submission_id}:task"
+
+
+def store_payload(redis_client, submission_id: str, payload: dict, ttl: int = 3600) -> None:
+    """Keep the task arguments so an expired lease can be re-queued."""
+    redis_client.setex(payload_key(submission_id), ttl, json.dumps(payload))
+
+
+def load_payload(redis_client, submission_id: str) -> Optional[dict]:
+    payload = redis_client.get(payload_key(submission_id))
+    return json.loads(payload) if payload else None
+
+
+def record_sweep(redis_client, submission_id: str, ttl: int = 3600) -> int:
+    """Count a re-queue after an expired lease; returns the count so far."""
+    key = f"{payload_key(submission_id)}:sweeps"
+    pipe = redis_client.pipeline()
+    pipe.incr(key)
+    pipe.expire(key, ttl)
+    return pipe.execute()[0]
+
+
+def load_status(redis_client, submission_id: str) -> Optional[str]:
+    record = redis_client.get(f"submission:{submission_id}")
+    return json.loads(record).get("status") if record else None
+
+
+def acquire_lease(redis_client, submission_id: str, owner: str) -> bool:
+    """Take the lease, or re-take it if ``owner`` already holds it (task redelivery/retry)."""
+    key = lease_key(submission_id)
+    acquired = redis_client.set(key, owner, nx=True, ex=LEASE_TTL_SEC)
+    if not acquired:
+        current = redis_client.get(key)
+        if current is None or current.decode() != owner:
+            return False
+        redis_client.expire(key, LEASE_TTL_SEC)
+    redis_client.zadd(LEASES_KEY, {submission_id: time.time() + LEASE_TTL_SEC})
+    return True
+
+
+def release_lease(redis_client, submission_id: str, owner: str) -> None:
+    key = lease_key(submission_id)
+    current = redis_client.get(key)
+    if current is not None and current.decode() == owner:
+        redis_client.delete(key)
+    redis_client.zrem(LEASES_KEY, submission_id)
+
+
+def claim_expired_leases(redis_client, now: Optional[float] = None) -> List[str]:
+    """
+    Return submissions whose lease expired. ZREM acts as the claim, so when every
+    worker runs the sweeper each expired lease is still handed to only one of them.
+    """
+    now = now or time.time()
+    claimed = []
+    for member in redis_client.zrangebyscore(LEASES_KEY, 0, now):
+        if redis_client.zrem(LEASES_KEY, member):
+            claimed.append(member.decode())
+    return claimed
+
+
+def record_routed(redis_client, submission_id: str) -> None:
+    redis_client.zadd(ROUTED_KEY, {submission_id: time.time() + ROUTED_START_TIMEOUT_SEC})
+
+
+def mark_started(redis_client, submission_id: str) -> None:
+    redis_client.zrem(ROUTED_KEY, submission_id)
+
+
+def claim_stranded(redis_client, now: Optional[float] = None) -> List[str]:
+    """Return routed submissions that did not start in time, claimed like expired leases."""
+    now = now or time.time()
+    claimed = []
+    for member in redis_client.zrangebyscore(ROUTED_KEY, 0, now):
+        if redis_client.zrem(ROUTED_KEY, member):
+            claimed.append(member.decode())
+    return claimed
@@ -0,0 +1,138 @@
+import os
+import threading
+
+import docker
+from celery.signals import (
+    celeryd_after_setup,
+    task_postrun,
+    task_prerun,
+    worker_ready,
+    worker_shutdown,
+)
+
+from app.services import calibration, fleet
+from app.services.reaper import SandboxReaper
+from tasks.tasks import redis_client, requeue_expired_leases, requeue_stranded
+
+REAPER_INTERVAL_SEC = float(os.getenv("OJ_REAPER_INTERVAL_SEC", "30"))
+REAPER_METRICS_KEY = "metrics:reaper"
+LEASE_SWEEP_INTERVAL_SEC = float(os.getenv("OJ_LEASE_SWEEP_INTERVAL_SEC", "15"))
+LEASE_METRICS_KEY = "metrics:leases"
+
+_stop_event = threading.Event()
+_node = {"total_slots": 0, "images": []}
+
+
+@celeryd_after_setup.connect
+def prepare_node(sender, instance, **kwargs):
+    """
+    Runs before the worker starts consuming: subscribe to this node's own queue
+    and pull/pre-warm runtime images so routed tasks never hit a cold start.
+    """
+    instance.app.amqp.queues.select_add(fleet.node_queue(fleet.NODE_NAME))
+    client = docker.DockerClient(base_url="unix:///var/run/docker.sock")
+    _node["images"] = fleet.prepare_images(client)
+    _node["total_slots"] = instance.concurrency
+    fleet.clear_slots(redis_client, fleet.NODE_NAME)
+    _recalibrate()
+    print(f"Node {fleet.NODE_NAME} ready with images:", _node["images"])
+
+
+def _recalibrate():
+    factor = calibration.calibrate()
+    calibration.store_speed_factor(redis_client, fleet.NODE_NAME, factor)
+    print(f"Node {fleet.NODE_NAME} speed factor:", factor)
+
+
+def _calibration_loop():
+    """Re-run the speed benchmark periodically, but only while no sandbox is running."""
+    while not _stop_event.wait(calibration.CALIBRATION_INTERVAL_SEC):
+        try:
+            if fleet.active_slots(redis_client, fleet.NODE_NAME) == 0:
+                _recalibrate()
+        except Exception as e:
+            print("Calibration failed:", e)
+
+
+def _heartbeat_loop():
+    """Advertise free sandbox slots, cached images and languages for dispatch."""
+    client = docker.DockerClient(base_url="unix:///var/run/docker.sock")
+    while True:
+        try:
+            _node["images"] = fleet.cached_images(client)
+            fleet.publish_heartbeat(
+                redis_client,
+                fleet.NODE_NAME,
+                _node["total_slots"],
+                _node["images"],
+                calibration.load_speed_factor(redis_client, fleet.NODE_NAME),
+            )
+        except Exception as e:
+            print("Heartbeat failed:", e)
+        if _stop_event.wait(fleet.HEARTBEAT_INTERVAL_SEC):
+            break
+
+
+@task_prerun.connect
+def claim_slot(sender=None, task_id=None, **kwargs):
+    if sender is not None and sender.name == "tasks.execute_code":
+        fleet.claim_slot(redis_client, fleet.NODE_NAME, task_id)
+
+
+@task_postrun.connect
+def free_slot(sender=None, task_id=None, **kwargs):
+    if sender is not None and sender.name == "tasks.execute_code":
+        fleet.free_slot(redis_client, fleet.NODE_NAME, task_id)
+
+
+def _reaper_loop():
+    """Periodically remove sandboxes leaked by killed tasks on this worker's Docker host."""
+    reaper = SandboxReaper()
+    while not _stop_event.wait(REAPER_INTERVAL_SEC):
+        try:
+            counts = reaper.reap()
+        except Exception as e:
+            print("Sandbox reaper failed:", e)
+            continue
+
+        pipe = redis_client.pipeline()
+        pipe.hincrby(REAPER_METRICS_KEY, "runs", 1)
+        for name, count in counts.items():
+            pipe.hincrby(REAPER_METRICS_KEY, name, count)
+        pipe.execute()
+        if any(counts.values()):
+            print("Sandbox reaper:", counts)
+
+
+def _lease_sweeper_loop():
+    """
+    Re-queue submissions whose worker died mid-task and never released its
+    lease, and those routed to a node that never started them.
+    """
+    while not _stop_event.wait(LEASE_SWEEP_INTERVAL_SEC):
+        try:
+            requeued = requeue_expired_leases()
+            rerouted = requeue_stranded()
+        except Exception as e:
+            print("Lease sweeper failed:", e)
+            continue
+
+        if requeued:
+            redis_client.hincrby(LEASE_METRICS_KEY, "requeued", requeued)
+        if rerouted:
+            redis_client.hincrby(LEASE_METRICS_KEY, "rerouted", rerouted)
+
+
+@worker_ready.connect
+def start_maintenance_threads(**kwargs):
+    threading.Thread(target=_reaper_loop, name="sandbox-reaper", daemon=True).start()
+    threading.Thread(target=_lease_sweeper_loop, name="lease-sweeper", daemon=True).start()
+    threading.Thread(target=_heartbeat_loop, name="heartbeat", daemon=True).start()
+    threading.Thread(target=_calibration_loop, name="calibration", daemon=True).start()
+
+
+@worker_shutdown.connect
+def stop_maintenance_threads(**kwargs):
+    _stop_event.set()
+    # Stop receiving routed work right away instead of waiting for the TTL
+    redis_client.delete(fleet.worker_key(fleet.NODE_NAME))
@@ -1,6 +1,29 @@
 from tasks.celery_app import celery_application
-from app.services.executor import PySandboxExecutor, CppSandboxExecutor
+from tasks.leases import (
+    FINAL_STATUSES,
+    MAX_SWEEPS,
+    ROUTED_START_TIMEOUT_SEC,
+    acquire_lease,
+    release_lease,
+    claim_expired_leases,
+    claim_stranded,
+    lease_key,
+    load_payload,
+    load_status,
+    mark_started,
+    record_routed,
+    record_sweep,
+    store_payload,
+)
+from app.services.executor import SandboxExecutor, INFRA_ERRORS
+from app.services.interactive import InteractiveExecutor
+from app.services.runtimes import get_runtime
+from app.services.calibration import load_speed_factor
+from app.services.fleet import NODE_NAME, choose_queue
+from app.services import input_storage
+from app.core.tracing import Trace
 import redis
+import random
 import json
 import os
 
@@ -8,46 +31,139 @@ import os
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 redis_client = redis.from_url(REDIS_URL)
 
-@celery_application.task(name="tasks.execute_code")
-def execute_code(submission_id: str, source_code: str, stdin_data: str, 
-                 time_limit_sec: float, memory_limit_mb: int, cpu_cores: float, lang: str):
+MAX_RETRIES = int(os.getenv("OJ_TASK_MAX_RETRIES", "3"))
+RETRY_BACKOFF_MAX_SEC = 30
+
+
+class InfrastructureError(Exception):
+    """The sandbox failed for reasons unrelated to the submission."""
+
+
+RETRYABLE_ERRORS = INFRA_ERRORS + (InfrastructureError, redis.exceptions.ConnectionError)
+
+
+def _retry_countdown(retries: int) -> float:
+    return min(RETRY_BACKOFF_MAX_SEC, 2 ** retries) + random.uniform(0, 1)
+
+
+def _store_result(submission_id: str, result: dict) -> None:
+    redis_client.setex(
+        f"submission:{submission_id}",
+        3600,  # 1 hour TTL
+        json.dumps(result)
+    )
+
+
+@celery_application.task(
+    name="tasks.execute_code",
+    bind=True,
+    acks_late=True,
+    reject_on_worker_lost=True,
+    max_retries=MAX_RETRIES,
+)
+def execute_code(self, submission_id: str, source_code: str, stdin_data: str,
+                 time_limit_sec: float, memory_limit_mb: int, cpu_cores: float, lang: str,
+                 debug: bool = False, traceparent: str = None,
+                 interactor_source: str = None, interactor_lang: str = None,
+                 rerun: bool = False, stdin_ref: str = None):
     """
-    Background task to execute user code in sandbox
+    Background task to execute user code in sandbox.
+
+    Safe to run more than once per submission: redeliveries of finished
+    submissions are no-ops, and the submission lease keeps two workers from
+    running it at the same time. Borderline TLEs are re-run once before the
+    verdict is stored.
     """
+    mark_started(redis_client, submission_id)
+    status = load_status(redis_client, submission_id)
+    if status in FINAL_STATUSES:
+        print("Submission already finished, skipping:", submission_id)
+        return None
+
+    owner = self.request.id or submission_id
+    if not acquire_lease(redis_client, submission_id, owner):
+        print("Submission leased by another worker, skipping:", submission_id)
+        return None
+
+    trace = Trace(traceparent)
+    lease_held = True
     try:
         # Update status to PROCESSING
-        redis_client.setex(
-            f"submission:{submission_id}",
-            3600,  # 1 hour TTL
-            json.dumps({
+        _store_result(submission_id, {
+            "submission_id": submission_id,
+            "status": "PROCESSING",
+            "stdout": None,
+            "stderr": None,
+            "exit_code": None,
+            "time_sec": None,
+        })
+
+        # Execute code
+        print("Executing code for lang:", lang)
+        print("Running code execution task for submission:", submission_id)
+        speed_factor = load_speed_factor(redis_client, NODE_NAME)
+        # Uploaded inputs are checked against their upload checksum, then mounted
+        stdin_path = input_storage.verify(stdin_ref) if stdin_ref else None
+        with trace.span("task.execute_code", submission_id=submission_id, lang=lang):
+            if interactor_source:
+                executor = InteractiveExecutor(
+                    get_runtime(lang),
+                    get_runtime(interactor_lang or "cpp"),
+                    time_limit_sec=time_limit_sec,
+                    memory_limit_mb=memory_limit_mb,
+                    cpu_cores=cpu_cores,
+                    speed_factor=speed_factor,
+                )
+                result = executor.run(
+                    source_code=source_code,
+                    interactor_source=interactor_source,
+                    stdin_data=stdin_data,
+                    trace=trace,
+                    submission_id=submission_id,
+                    stdin_path=stdin_path,
+                )
+            else:
+                executor = SandboxExecutor(
+                    get_runtime(lang),
+                    time_limit_sec=time_limit_sec,
+                    memory_limit_mb=memory_limit_mb,
+                    cpu_cores=cpu_cores,
+                    speed_factor=speed_factor,
+                )
+                result = executor.run(
+                    source_code=source_code,
+                    stdin_data=stdin_data,
+                    trace=trace,
+                    submission_id=submission_id,
+                    stdin_path=stdin_path,
+                )
+        print("Result: ", result)
+        if result.get("retryable") and self.request.retries < self.max_retries:
+            raise InfrastructureError(result["stderr"])
+
+        if result.get("borderline") and not rerun:
+            # Just over the limit may be host noise: run again on the least busy
+            # node and let that run decide
+            langs = [lang, interactor_lang or "cpp"] if interactor_source else [lang]
+            print("Borderline TLE, re-running submission:", submission_id)
+            rerun_kwargs = {**self.request.kwargs, "rerun": True}
+            # A sweeper re-queue of the re-run must not trigger yet another re-run
+            store_payload(redis_client, submission_id, rerun_kwargs)
+            _store_result(submission_id, {
                 "submission_id": submission_id,
-                "status": "PROCESSING",
+                "status": "PENDING",
                 "stdout": None,
                 "stderr": None,
                 "exit_code": None,
                 "time_sec": None,
             })
-        )
-        
-        # Execute code
-        print("Executing code for lang:", lang)
-        if lang == "python":
-            executor = PySandboxExecutor(
-                image="oj-python-runner",
-                time_limit_sec=time_limit_sec,
-                memory_limit_mb=memory_limit_mb,
-                cpu_cores=cpu_cores,
-            )
-        else:
-            executor = CppSandboxExecutor(
-                image="oj-cpp-runner",
-                time_limit_sec=time_limit_sec,
-                memory_limit_mb=memory_limit_mb,
-                cpu_cores=cpu_cores,
-            )
-        print("Running code execution task for submission:", submission_id)
-        result = executor.run(source_code=source_code, stdin_data=stdin_data)
-        print("Result: ", result)
+            # Hand the lease back before queueing, so the re-run can take it
+            # no matter which worker picks it up or how soon
+            release_lease(redis_client, submission_id, owner)
+            lease_held = False
+            dispatch(rerun_kwargs, langs)
+            return None
+
         # Store result in Redis
         execution_result = {
             "submission_id": submission_id,
@@ -57,30 +173,114 @@ def execute_code(submission_id: str, source_code: str, stdin_data: str,
             "exit_code": result["exit_code"],
             "time_sec": result["time_sec"],
         }
-        
-        redis_client.setex(
-            f"submission:{submission_id}",
-            3600,  # 1 hour TTL
-            json.dumps(execution_result)
-        )
-        
+        if debug:
+            execution_result["timings"] = trace.timings
+
+        _store_result(submission_id, execution_result)
+
         return execution_result
-        
+
+    except RETRYABLE_ERRORS as e:
+        if self.request.retries < self.max_retries:
+            countdown = _retry_countdown(self.request.retries)
+            print(f"Infrastructure error for {submission_id}, retrying in {countdown:.1f}s:", e)
+            _store_result(submission_id, {
+                "submission_id": submission_id,
+                "status": "PENDING",
+                "stdout": None,
+                "stderr": None,
+                "exit_code": None,
+                "time_sec": None,
+            })
+            # Retries go to the shared queue without the routed message's expiry:
+            # Celery would otherwise copy both, and a retry due after that expiry
+            # is revoked while neither sweeper tracks the submission any more
+            raise self.retry(
+                exc=e,
+                countdown=countdown,
+                queue=celery_application.conf.task_default_queue,
+                expires=None,
+            )
+        return _store_error(submission_id, e)
+
     except Exception as e:
-        # Store error in Redis
-        error_result = {
-            "submission_id": submission_id,
-            "status": "INTERNAL_ERROR",
-            "stdout": None,
-            "stderr": str(e),
-            "exit_code": None,
-            "time_sec": None,
-        }
-        
-        redis_client.setex(
-            f"submission:{submission_id}",
-            3600,
-            json.dumps(error_result)
-        )
-        
-        return error_result
+        return _store_error(submission_id, e)
+
+    finally:
+        if lease_held:
+            release_lease(redis_client, submission_id, owner)
+
+
+def _store_error(submission_id: str, e: Exception) -> dict:
+    # Store error in Redis
+    error_result = {
+        "submission_id": submission_id,
+        "status": "INTERNAL_ERROR",
+        "stdout": None,
+        "stderr": str(e),
+        "exit_code": None,
+        "time_sec": None,
+    }
+    _store_result(submission_id, error_result)
+    return error_result
+
+
+def dispatch(payload: dict, langs: list, task_id: str = None) -> None:
+    """
+    Queue a submission, preferring a node that already has the runtime images
+    and a free slot. Routed submissions are recorded until they start, and their
+    message expires, so work stranded on a dead node is re-dispatched.
+    """
+    options = {}
+    queue = choose_queue(redis_client, langs)
+    if queue:
+        options["queue"] = queue
+        options["expires"] = ROUTED_START_TIMEOUT_SEC
+        record_routed(redis_client, payload["submission_id"])
+    execute_code.apply_async(kwargs=payload, task_id=task_id, **options)
+
+
+def requeue_stranded() -> int:
+    """Re-dispatch routed submissions whose node never started them to the default queue."""
+    requeued = 0
+    for submission_id in claim_stranded(redis_client):
+        if load_status(redis_client, submission_id) in FINAL_STATUSES:
+            continue
+        if redis_client.exists(lease_key(submission_id)):
+            # Started after all, just before the deadline
+            continue
+
+        payload = load_payload(redis_client, submission_id)
+        if payload is None:
+            _store_error(submission_id, Exception("Submission lost after worker failure"))
+            continue
+
+        # A fresh task id: the expired original is revoked by id on any worker
+        # that receives it, which must not also discard this copy
+        print("Re-dispatching submission stranded on a node queue:", submission_id)
+        execute_code.apply_async(kwargs=payload)
+        requeued += 1
+    return requeued
+
+
+def requeue_expired_leases() -> int:
+    """Re-queue submissions whose worker died while holding the lease."""
+    requeued = 0
+    for submission_id in claim_expired_leases(redis_client):
+        if load_status(redis_client, submission_id) in FINAL_STATUSES:
+            continue
+
+        payload = load_payload(redis_client, submission_id)
+        if payload is None:
+            _store_error(submission_id, Exception("Submission lost after worker failure"))
+            continue
+
+        sweeps = record_sweep(redis_client, submission_id)
+        if sweeps > MAX_SWEEPS:
+            _store_error(submission_id, Exception(f"Submission abandoned after {MAX_SWEEPS} worker failures"))
+            continue
+
+        print("Re-queueing submission with expired lease:", submission_id)
+        execute_code.apply_async(kwargs=payload)
+        requeued += 1
+    return requeued
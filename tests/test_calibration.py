@@ -0,0 +1,80 @@
+import json
+
+import fakeredis
+import pytest
+
+from app.services import calibration
+from tasks import leases
+from tasks import tasks
+
+
+@pytest.mark.parametrize("benchmark_sec, factor", [
+    (0.5, 2.0),
+    (100.0, calibration.MIN_SPEED_FACTOR),
+    (0.001, calibration.MAX_SPEED_FACTOR),
+])
+def test_calibrate_clamps_speed_factor(monkeypatch, benchmark_sec, factor):
+    monkeypatch.setattr(calibration, "run_benchmark", lambda: benchmark_sec)
+    assert calibration.calibrate(reference_sec=1.0) == factor
+
+
+def test_calibration_disabled_without_reference(monkeypatch):
+    monkeypatch.setattr(calibration, "run_benchmark", lambda: pytest.fail("benchmark should not run"))
+    assert calibration.calibrate(reference_sec=0) == 1.0
+
+
+class BorderlineExecutor:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def run(self, **kwargs):
+        return {"status": "TLE", "stdout": "", "stderr": "", "exit_code": None, "time_sec": 2.1, "borderline": True}
+
+
+@pytest.fixture
+def borderline_task(monkeypatch):
+    redis_client = fakeredis.FakeRedis()
+    queued = []
+
+    def apply_async(args=None, kwargs=None, **options):
+        queued.append(kwargs)
+
+    monkeypatch.setattr(tasks, "redis_client", redis_client)
+    monkeypatch.setattr(tasks, "SandboxExecutor", BorderlineExecutor)
+    monkeypatch.setattr(tasks.execute_code, "apply_async", apply_async)
+
+    def run(**overrides):
+        kwargs = {
+            "submission_id": "sub-1", "source_code": "while True: pass", "stdin_data": "",
+            "time_limit_sec": 2.0, "memory_limit_mb": None, "cpu_cores": None, "lang": "python",
+            **overrides,
+        }
+        leases.store_payload(redis_client, "sub-1", kwargs)
+        tasks.execute_code.push_request(id="task-1", called_directly=False, retries=0, kwargs=kwargs)
+        try:
+            return tasks.execute_code(**kwargs)
+        finally:
+            tasks.execute_code.pop_request()
+
+    return redis_client, queued, run
+
+
+def test_borderline_tle_is_rerun_with_the_lease_released(borderline_task):
+    redis_client, queued, run = borderline_task
+
+    assert run() is None
+    assert [kwargs["rerun"] for kwargs in queued] == [True]
+    assert leases.load_payload(redis_client, "sub-1")["rerun"] is True
+    assert leases.load_status(redis_client, "sub-1") == "PENDING"
+    assert redis_client.get(leases.lease_key("sub-1")) is None
+    # The re-run can take the lease
+    assert leases.acquire_lease(redis_client, "sub-1", "task-2")
+
+
+def test_borderline_tle_on_rerun_is_final(borderline_task):
+    redis_client, queued, run = borderline_task
+
+    result = run(rerun=True)
+    assert queued == []
+    assert result["status"] == "TLE"
+    assert json.loads(redis_client.get("submission:sub-1"))["status"] == "TLE"
@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+from app.services import executor
+from app.services.runtimes import RUNTIMES
+from app.services.workspace import Workspace
+
+
+class LogStream:
+    """Like docker-py's CancellableStream: an iterator over chunks that must be closed."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self.read = 0
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self.read += 1
+        return next(self._chunks)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeContainer:
+    def __init__(self, started_at, finished_at, exit_code=0, output=b"hello\n"):
+        self.attrs = {"State": {"StartedAt": started_at, "FinishedAt": finished_at, "ExitCode": exit_code}}
+        self.output = output
+        self.removed = False
+
+    def reload(self):
+        pass
+
+    def logs(self, stdout, stderr, stream, follow):
+        return LogStream([self.output if stdout else b""])
+
+    def remove(self, force):
+        self.removed = True
+
+
+class FakeClient:
+    def __init__(self, container, startup_sec=0.0):
+        self.container = container
+        self.startup_sec = startup_sec
+        self.containers = self
+
+    def run(self, **kwargs):
+        # Docker create/start time, unrelated to the host's CPU speed
+        time.sleep(self.startup_sec)
+        return self.container
+
+
+@pytest.fixture(autouse=True)
+def no_docker(monkeypatch):
+    monkeypatch.setattr(executor.docker, "DockerClient", lambda **kwargs: None)
+
+
+def test_docker_time_keeps_nanosecond_precision():
+    assert executor.docker_time("0001-01-01T00:00:00Z") is None
+    assert executor.docker_time("") is None
+    started = executor.docker_time("2026-10-19T09:00:00.100000000Z")
+    finished = executor.docker_time("2026-10-19T11:00:00.350000001+02:00")
+    assert finished - started == pytest.approx(0.25)
+
+
+def test_container_startup_is_not_scaled_by_speed_factor(tmp_path):
+    container = FakeContainer("2026-10-19T09:00:00.0Z", "2026-10-19T09:00:00.1Z")
+    sandbox = executor.SandboxExecutor(RUNTIMES["python"], time_limit_sec=0.5, speed_factor=4.0)
+    sandbox.client = FakeClient(container, startup_sec=0.3)
+
+    with Workspace(root=str(tmp_path)) as workspace:
+        workspace.write("input.txt", "")
+        result = sandbox._execute(workspace, "256m", 1_000_000_000, executor.Trace(enabled=False))
+
+    # 0.1s of program time on a 4x host is 0.4s on the reference host
+    assert result["status"] == "OK"
+    assert result["time_sec"] == pytest.approx(0.4)
+    assert result["stdout"] == "hello\n"
+    assert container.removed
+
+
+def test_legacy_cpp_executor_uses_runtime_compile_limit():
+    sandbox = executor.CppSandboxExecutor()
+    assert sandbox.compile_time_limit_sec == RUNTIMES["cpp"].compile_time_limit_sec
+
+
+def test_truncated_log_stream_is_closed():
+    sandbox = executor.SandboxExecutor(RUNTIMES["python"])
+    stream = LogStream([b"x" * 600_000, b"y" * 600_000, b"z" * 600_000])
+
+    class Container:
+        def logs(self, **kwargs):
+            return stream
+
+    output = sandbox._read_logs(Container(), stdout=True, stderr=False)
+
+    assert output.endswith(f"[output truncated at {RUNTIMES['python'].max_output_bytes} bytes]")
+    assert stream.read == 2
+    assert stream.closed
@@ -0,0 +1,33 @@
+import time
+
+import fakeredis
+
+from app.services import fleet
+
+
+def test_slot_of_killed_task_expires_instead_of_leaking(monkeypatch):
+    monkeypatch.setattr(fleet, "SLOT_TTL_SEC", 1)
+    redis_client = fakeredis.FakeRedis()
+    fleet.claim_slot(redis_client, "node-a", "task-1")
+    fleet.claim_slot(redis_client, "node-a", "task-2")
+    fleet.claim_slot(redis_client, "node-b", "task-3")
+    assert fleet.active_slots(redis_client, "node-a") == 2
+
+    fleet.free_slot(redis_client, "node-a", "task-1")
+    assert fleet.active_slots(redis_client, "node-a") == 1
+
+    # task-2's pool child died before task_postrun: its claim still expires
+    time.sleep(1.1)
+    assert fleet.active_slots(redis_client, "node-a") == 0
+    assert fleet.active_slots(redis_client, "node-b") == 0
+
+
+def test_heartbeat_counts_running_tasks():
+    redis_client = fakeredis.FakeRedis()
+    fleet.claim_slot(redis_client, "node-a", "task-1")
+    info = fleet.publish_heartbeat(redis_client, "node-a", total_slots=4, images=[])
+    assert info["free_slots"] == 3
+
+    fleet.clear_slots(redis_client, "node-a")
+    info = fleet.publish_heartbeat(redis_client, "node-a", total_slots=4, images=[])
+    assert info["free_slots"] == 4
@@ -0,0 +1,71 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from app.services import input_storage
+
+
+@pytest.fixture(autouse=True)
+def storage_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(input_storage, "INPUT_STORAGE_DIR", str(tmp_path / "inputs"))
+    monkeypatch.setattr(input_storage, "INPUT_VERIFIED_DIR", str(tmp_path / "verified"))
+    return tmp_path / "inputs"
+
+
+def save(data, **kwargs):
+    async def chunks():
+        for i in range(0, len(data), 4):
+            yield data[i:i + 4]
+    return asyncio.run(input_storage.save_stream(chunks(), **kwargs))
+
+
+def test_save_stream_then_verify():
+    data = b"1 2 3\n4 5 6\n"
+    input_id, sha256, size = save(data, expected_sha256=hashlib.sha256(data).hexdigest().upper())
+
+    assert (sha256, size) == (hashlib.sha256(data).hexdigest(), len(data))
+    path = input_storage.verify(input_id)
+    with open(path, "rb") as f:
+        assert f.read() == data
+
+
+def test_rejected_upload_leaves_nothing_behind(storage_dir):
+    with pytest.raises(input_storage.InputTooLarge):
+        save(b"x" * 100, max_bytes=10)
+    with pytest.raises(input_storage.InputChecksumMismatch):
+        save(b"data", expected_sha256="0" * 64)
+    assert os.listdir(storage_dir) == []
+
+
+def test_verify_detects_corruption_and_bad_ids():
+    input_id, _, _ = save(b"original")
+    with open(input_storage.input_path(input_id), "wb") as f:
+        f.write(b"tampered")
+    with pytest.raises(input_storage.InputChecksumMismatch):
+        input_storage.verify(input_id)
+
+    with pytest.raises(input_storage.InputNotFound):
+        input_storage.verify("../../etc/passwd")
+    with pytest.raises(input_storage.InputNotFound):
+        input_storage.verify("0" * 32)
+
+
+def test_verify_hashes_once_per_node_until_the_file_changes(monkeypatch):
+    input_id, _, _ = save(b"large input")
+    input_storage.verify(input_id)
+
+    hashed = []
+    real_iter_file = input_storage.iter_file
+    monkeypatch.setattr(input_storage, "iter_file", lambda path: hashed.append(path) or real_iter_file(path))
+    input_storage.verify(input_id)
+    assert hashed == []
+
+    path = input_storage.input_path(input_id)
+    with open(path, "wb") as f:
+        f.write(b"large inpuX")
+    os.utime(path, ns=(0, 0))
+    with pytest.raises(input_storage.InputChecksumMismatch):
+        input_storage.verify(input_id)
+    assert hashed == [path]
@@ -0,0 +1,107 @@
+import socket
+import struct
+import threading
+import time
+
+from app.services import executor
+from app.services.interactive import InteractiveExecutor, _StdoutDemuxer, combined_verdict
+from app.services.runtimes import RUNTIMES
+from app.services.workspace import Workspace
+
+
+def frame(payload: bytes, stream: int = 1) -> bytes:
+    """Docker's multiplexed attach framing: stream type, 3 zero bytes, big-endian length."""
+    return struct.pack(">BxxxL", stream, len(payload)) + payload
+
+
+def test_contestant_exiting_early_sends_eof_to_interactor():
+    contestant_judge, contestant_container = socket.socketpair()
+    interactor_judge, interactor_container = socket.socketpair()
+
+    # The contestant prints one line and exits without waiting for the interactor
+    contestant_container.sendall(frame(b"42\n"))
+    contestant_container.close()
+
+    result = {}
+    relay = threading.Thread(
+        target=lambda: result.setdefault(
+            "finished",
+            InteractiveExecutor._relay(contestant_judge, interactor_judge, time.time() + 5),
+        )
+    )
+    relay.start()
+
+    # The interactor reads until EOF; this only returns if EOF is propagated
+    interactor_container.settimeout(5)
+    received = b""
+    while True:
+        chunk = interactor_container.recv(1024)
+        if not chunk:
+            break
+        received += chunk
+    interactor_container.close()
+
+    relay.join(5)
+    assert received == b"42\n"
+    assert result["finished"] is True
+
+
+def test_interactor_rejection_is_wa_even_if_contestant_exited_cleanly():
+    assert combined_verdict(contestant_exit=0, interactor_exit=1) == "WA"
+    assert combined_verdict(contestant_exit=0, interactor_exit=0) == "OK"
+    assert combined_verdict(contestant_exit=139, interactor_exit=0) == "RE"
+    assert combined_verdict(contestant_exit=0, interactor_exit=3) == "INTERNAL_ERROR"
+
+
+def test_demuxer_reassembles_frames_split_across_reads():
+    judge, container = socket.socketpair()
+    demuxer = _StdoutDemuxer(judge)
+    data = frame(b"hello ") + frame(b"noise", stream=2) + frame(b"world\n")
+
+    # Split inside the first header, inside a payload and inside the stderr frame
+    out = b""
+    for piece in (data[:3], data[3:10], data[10:20], data[20:]):
+        container.sendall(piece)
+        out += demuxer.read()
+    container.close()
+
+    assert out == b"hello world\n"
+    assert demuxer.read() == b""
+    assert demuxer.eof
+
+
+class RecordingClient:
+    """Records the containers created, then fails the attach so nothing runs."""
+
+    def __init__(self):
+        self.created = []
+        self.containers = self
+
+    def create(self, **kwargs):
+        self.created.append(kwargs)
+
+        class Container:
+            attrs = {"Config": {"StdinOnce": True}}
+
+            def attach_socket(self, params):
+                raise RuntimeError("not attaching in tests")
+
+            def remove(self, force):
+                pass
+
+        return Container()
+
+
+def test_interactor_gets_testlib_input_and_output_arguments(monkeypatch, tmp_path):
+    monkeypatch.setattr(executor.docker, "DockerClient", lambda **kwargs: None)
+    judge = InteractiveExecutor(RUNTIMES["python"], RUNTIMES["cpp"])
+    judge.client = RecordingClient()
+
+    with Workspace(root=str(tmp_path)) as contestant_ws, Workspace(root=str(tmp_path)) as interactor_ws:
+        judge._interact(contestant_ws, interactor_ws, executor.Trace(enabled=False), "sub-1")
+
+    contestant, interactor = judge.client.created
+    assert contestant["command"] == ["sh", "-c", "python main.py"]
+    assert interactor["command"] == ["sh", "-c", "./main input.txt /tmp/output.txt"]
+    # The output file lives on the interactor's writable scratch tmpfs
+    assert "/tmp" in interactor["tmpfs"] and "rw" in interactor["tmpfs"]["/tmp"]
@@ -0,0 +1,116 @@
+import json
+
+import docker
+import fakeredis
+import pytest
+from celery.exceptions import Retry
+
+from tasks import leases
+from tasks import tasks
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis()
+
+
+def test_same_owner_can_retake_lease(redis_client):
+    assert leases.acquire_lease(redis_client, "sub-1", "task-a")
+    # Redelivery or retry of the same task
+    assert leases.acquire_lease(redis_client, "sub-1", "task-a")
+    assert not leases.acquire_lease(redis_client, "sub-1", "task-b")
+
+
+def test_release_only_by_owner(redis_client):
+    leases.acquire_lease(redis_client, "sub-1", "task-a")
+    leases.release_lease(redis_client, "sub-1", "task-b")
+    assert redis_client.get(leases.lease_key("sub-1")) == b"task-a"
+
+    leases.release_lease(redis_client, "sub-1", "task-a")
+    assert leases.acquire_lease(redis_client, "sub-1", "task-b")
+
+
+def test_expired_lease_is_claimed_once(redis_client):
+    leases.acquire_lease(redis_client, "sub-1", "task-a")
+    leases.acquire_lease(redis_client, "sub-2", "task-b")
+    later = redis_client.zscore(leases.LEASES_KEY, "sub-1") + 1
+
+    assert leases.claim_expired_leases(redis_client, now=later - leases.LEASE_TTL_SEC - 2) == []
+    assert sorted(leases.claim_expired_leases(redis_client, now=later)) == ["sub-1", "sub-2"]
+    # A second sweeper finds nothing left to claim
+    assert leases.claim_expired_leases(redis_client, now=later) == []
+
+
+@pytest.fixture
+def sweeper(redis_client, monkeypatch):
+    queued = []
+    monkeypatch.setattr(tasks, "redis_client", redis_client)
+    def apply_async(args=None, kwargs=None, **options):
+        queued.append({"kwargs": kwargs, **options})
+    monkeypatch.setattr(tasks.execute_code, "apply_async", apply_async)
+    return queued
+
+
+def expire_all(redis_client, key):
+    for member in redis_client.zrange(key, 0, -1):
+        redis_client.zadd(key, {member: 0})
+
+
+def test_sweeper_gives_up_after_max_sweeps(redis_client, sweeper):
+    leases.store_payload(redis_client, "sub-1", {"submission_id": "sub-1"})
+    for _ in range(leases.MAX_SWEEPS):
+        leases.acquire_lease(redis_client, "sub-1", "task-a")
+        redis_client.delete(leases.lease_key("sub-1"))
+        expire_all(redis_client, leases.LEASES_KEY)
+        assert tasks.requeue_expired_leases() == 1
+
+    leases.acquire_lease(redis_client, "sub-1", "task-a")
+    expire_all(redis_client, leases.LEASES_KEY)
+    assert tasks.requeue_expired_leases() == 0
+    assert len(sweeper) == leases.MAX_SWEEPS
+    assert json.loads(redis_client.get("submission:sub-1"))["status"] == "INTERNAL_ERROR"
+
+
+def test_stranded_routed_submission_goes_to_default_queue(redis_client, sweeper):
+    leases.store_payload(redis_client, "sub-1", {"submission_id": "sub-1"})
+    leases.store_payload(redis_client, "sub-2", {"submission_id": "sub-2"})
+    leases.record_routed(redis_client, "sub-1")
+    leases.record_routed(redis_client, "sub-2")
+    leases.mark_started(redis_client, "sub-2")
+    expire_all(redis_client, leases.ROUTED_KEY)
+
+    assert tasks.requeue_stranded() == 1
+    assert sweeper == [{"kwargs": {"submission_id": "sub-1"}}]
+
+
+class FailingExecutor:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def run(self, **kwargs):
+        raise docker.errors.APIError("daemon unavailable")
+
+
+def test_retry_of_routed_task_drops_expiry_and_node_queue(redis_client, sweeper, monkeypatch):
+    monkeypatch.setattr(tasks, "SandboxExecutor", FailingExecutor)
+    leases.record_routed(redis_client, "sub-1")
+    tasks.execute_code.push_request(
+        id="sub-1",
+        called_directly=False,
+        retries=0,
+        expires="2026-01-01T00:00:00+00:00",
+        delivery_info={"exchange": "", "routing_key": "node.a"},
+    )
+    try:
+        with pytest.raises(Retry):
+            tasks.execute_code(
+                submission_id="sub-1", source_code="print(1)", stdin_data="",
+                time_limit_sec=None, memory_limit_mb=None, cpu_cores=None, lang="python",
+            )
+    finally:
+        tasks.execute_code.pop_request()
+
+    (retry,) = sweeper
+    assert retry["expires"] is None
+    assert retry["queue"] == tasks.celery_application.conf.task_default_queue
+    assert json.loads(redis_client.get("submission:sub-1"))["status"] == "PENDING"
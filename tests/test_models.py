@@ -0,0 +1,21 @@
+import pytest
+from pydantic import ValidationError
+
+from app.models import CodeSubmission
+from app.services import calibration
+
+
+def test_time_limit_budget_follows_calibration(monkeypatch):
+    monkeypatch.setattr(calibration, "REFERENCE_BENCHMARK_SEC", 0.0)
+    assert CodeSubmission(source_code="print(1)", time_limit_sec=10).time_limit_sec == 10
+
+    # With calibration on, a worker may run at a quarter of the reference speed
+    monkeypatch.setattr(calibration, "REFERENCE_BENCHMARK_SEC", 1.0)
+    with pytest.raises(ValidationError, match="time limit too large"):
+        CodeSubmission(source_code="print(1)", time_limit_sec=10)
+    CodeSubmission(source_code="int main() {}", lang="cpp", interactor_source="int main() {}")
+
+
+def test_time_limit_must_be_positive():
+    with pytest.raises(ValidationError):
+        CodeSubmission(source_code="print(1)", time_limit_sec=0)
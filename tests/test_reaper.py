@@ -0,0 +1,82 @@
+import os
+
+import docker
+
+from app.services import reaper
+from app.services.executor import DEADLINE_LABEL
+from app.services.workspace import WORKSPACE_PREFIX
+
+NOW = 1_000_000.0
+
+
+class FakeContainer:
+    def __init__(self, deadline, gone=False):
+        self.labels = {DEADLINE_LABEL: deadline}
+        self.gone = gone
+        self.removed = False
+
+    def remove(self, force):
+        if self.gone:
+            raise docker.errors.NotFound("already removed")
+        self.removed = True
+
+
+class FakeClient:
+    def __init__(self, containers):
+        self.containers = self
+        self._containers = containers
+
+    def list(self, all, filters):
+        return self._containers
+
+
+def touch(path, age):
+    os.utime(path, (NOW - age, NOW - age))
+
+
+def test_only_containers_past_their_deadline_are_reaped():
+    expired = FakeContainer(str(int(NOW - 1)))
+    running = FakeContainer(str(int(NOW + 60)))
+    unlabeled = FakeContainer("not-a-number")
+    raced = FakeContainer(str(int(NOW - 1)), gone=True)
+    sandbox_reaper = reaper.SandboxReaper(client=FakeClient([expired, running, unlabeled, raced]))
+
+    assert sandbox_reaper.reap_containers(NOW) == 2
+    assert expired.removed and unlabeled.removed
+    assert not running.removed
+
+
+def test_stale_workspaces_are_removed(tmp_path):
+    stale = tmp_path / f"{WORKSPACE_PREFIX}old"
+    fresh = tmp_path / f"{WORKSPACE_PREFIX}new"
+    unrelated = tmp_path / "something-else"
+    for path in (stale, fresh, unrelated):
+        path.mkdir()
+    (stale / "main").write_bytes(b"binary")
+    touch(stale, 600)
+    touch(fresh, 5)
+    touch(unrelated, 600)
+
+    sandbox_reaper = reaper.SandboxReaper(client=FakeClient([]), workspace_root=str(tmp_path), workspace_max_age_sec=120)
+    assert sandbox_reaper.reap_workspaces(NOW) == 1
+    assert sorted(p.name for p in tmp_path.iterdir()) == [fresh.name, unrelated.name]
+
+
+def test_expired_inputs_and_their_markers_are_removed(tmp_path, monkeypatch):
+    inputs, verified = tmp_path / "inputs", tmp_path / "verified"
+    inputs.mkdir()
+    verified.mkdir()
+    monkeypatch.setattr(reaper, "INPUT_STORAGE_DIR", str(inputs))
+    monkeypatch.setattr(reaper, "INPUT_VERIFIED_DIR", str(verified))
+
+    old_id, new_id = "a" * 32, "b" * 32
+    for name in (old_id, f"{old_id}.sha256", f"{old_id}.part", new_id, f"{new_id}.sha256"):
+        (inputs / name).write_text("x")
+        touch(inputs / name, reaper.INPUT_MAX_AGE_SEC + 1 if name.startswith(old_id) else 10)
+    (verified / old_id).write_text("1:1")
+    touch(verified / old_id, reaper.INPUT_MAX_AGE_SEC + 1)
+
+    # The input and its abandoned partial upload count; the checksum sidecar does not
+    assert reaper.SandboxReaper(client=FakeClient([])).reap_inputs(NOW) == 2
+    assert sorted(p.name for p in inputs.iterdir()) == [new_id, f"{new_id}.sha256"]
+    assert list(verified.iterdir()) == []
@@ -0,0 +1,33 @@
+import json
+import os
+
+import pytest
+
+from app.services import calibration
+from app.services.executor import worst_case_sec
+from app.services.runtimes import BUILTIN_RUNTIMES, load_runtimes
+from tasks.celery_app import TASK_SOFT_TIME_LIMIT_SEC
+
+EXAMPLE_RUNTIMES = os.path.join(os.path.dirname(__file__), "..", "docker", "runtimes.example.json")
+
+
+def test_example_runtimes_load_next_to_builtins(monkeypatch):
+    # Budget for the slowest host calibration allows
+    monkeypatch.setattr(calibration, "REFERENCE_BENCHMARK_SEC", 1.0)
+    runtimes = load_runtimes(EXAMPLE_RUNTIMES)
+
+    assert set(BUILTIN_RUNTIMES) | {"java", "go", "rust"} == set(runtimes)
+    assert runtimes["go"].name == "go"
+    assert runtimes["go"].compiled
+    for runtime in runtimes.values():
+        # Default limits must finish inside the Celery task time limit
+        assert worst_case_sec(runtime) <= TASK_SOFT_TIME_LIMIT_SEC, runtime.name
+
+
+def test_unknown_runtime_fields_are_rejected(tmp_path):
+    path = tmp_path / "runtimes.json"
+    path.write_text(json.dumps({
+        "zig": {"image": "zig", "source_filename": "main.zig", "run_command": "./main", "timeout": 3},
+    }))
+    with pytest.raises(ValueError, match="timeout"):
+        load_runtimes(str(path))
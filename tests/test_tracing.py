@@ -0,0 +1,42 @@
+import json
+
+from app.core.tracing import FileSpanExporter, Trace, parse_traceparent
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+def test_parse_traceparent():
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == (TRACE_ID, PARENT_ID)
+    assert parse_traceparent(None) == (None, None)
+    assert parse_traceparent("garbage") == (None, None)
+    assert parse_traceparent(f"00-{TRACE_ID[:8]}-{PARENT_ID}-01") == (None, None)
+
+
+def test_spans_nest_under_incoming_parent_and_accumulate_timings(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    trace = Trace(f"00-{TRACE_ID}-{PARENT_ID}-01", enabled=True, exporter=FileSpanExporter(str(path)))
+
+    with trace.span("task", lang="python") as task_span:
+        assert trace.traceparent == f"00-{TRACE_ID}-{task_span}-01"
+        with trace.span("poll"):
+            pass
+        with trace.span("poll"):
+            pass
+
+    poll, poll_again, task = [json.loads(line) for line in path.read_text().splitlines()]
+    assert task["parent_span_id"] == PARENT_ID
+    assert task["attributes"] == {"lang": "python"}
+    assert poll["parent_span_id"] == poll_again["parent_span_id"] == task["span_id"]
+    assert {span["trace_id"] for span in (poll, poll_again, task)} == {TRACE_ID}
+    assert task["end_time_unix_nano"] >= task["start_time_unix_nano"]
+    assert set(trace.timings) == {"task", "poll"}
+
+
+def test_disabled_trace_still_records_timings(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    trace = Trace(enabled=False)
+    with trace.span("execute"):
+        pass
+    assert "execute" in trace.timings
+    assert list(tmp_path.iterdir()) == []
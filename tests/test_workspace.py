@@ -0,0 +1,52 @@
+import subprocess
+
+import pytest
+
+from app.services.workspace import COMPILE_EXPORT_DIR, Workspace, WorkspaceQuotaExceeded
+
+
+def test_writes_past_the_cap_are_refused(tmp_path):
+    with Workspace(max_mb=1, root=str(tmp_path)) as workspace:
+        workspace.write("main.py", "x" * 1000)
+        with pytest.raises(WorkspaceQuotaExceeded):
+            workspace.write("input.txt", "y" * 1024 * 1024)
+        assert workspace.usage() == 1000
+
+
+def test_check_quota_catches_files_written_by_the_sandbox(tmp_path):
+    with Workspace(max_mb=1, root=str(tmp_path)) as workspace:
+        workspace.check_quota()
+        with open(f"{workspace.path}/main", "wb") as f:
+            f.write(b"\0" * (1024 * 1024 + 1))
+        with pytest.raises(WorkspaceQuotaExceeded):
+            workspace.check_quota()
+
+
+def test_compiler_works_in_a_tmpfs_sized_to_the_cap(tmp_path):
+    with Workspace(max_mb=8, root=str(tmp_path)) as workspace:
+        assert workspace.compile_volumes() == {workspace.path: {"bind": COMPILE_EXPORT_DIR, "mode": "rw"}}
+        tmpfs = workspace.compile_tmpfs(scratch_mb=32)
+        assert tmpfs["/workspace"] == "rw,exec,nosuid,size=8192k"
+        assert tmpfs["/tmp"] == "rw,noexec,nosuid,size=32m"
+
+
+def test_compile_command_copies_results_back_only_on_success(tmp_path):
+    export, build = tmp_path / "export", tmp_path / "build"
+    export.mkdir()
+    (export / "main.c").write_text("source")
+
+    def run(command):
+        # The same wrapper, with the container's mount points replaced by local dirs
+        build.mkdir(exist_ok=True)
+        script = Workspace.compile_command(command)
+        script = script.replace(COMPILE_EXPORT_DIR, str(export)).replace("/workspace", str(build))
+        return subprocess.run(["sh", "-c", script], cwd=build, capture_output=True, text=True)
+
+    failed = run("echo 'main.c:1: error' >&2; touch partial; exit 1")
+    assert failed.returncode == 1
+    assert "main.c:1: error" in failed.stdout
+    assert sorted(p.name for p in export.iterdir()) == ["main.c"]
+
+    built = run("cat main.c > main")
+    assert built.returncode == 0
+    assert (export / "main").read_text() == "source"
@@ -3,6 +3,7 @@
 """
 Verify that all dependencies and services are properly set up
 """
+import os
 import sys
 import subprocess
 import importlib
@@ -96,6 +97,34 @@ def check_docker_image():
     except (subprocess.TimeoutExpired, FileNotFoundError):
         return False
 
+HELLO_WORLD = {
+    "python": 'print("hello")\n',
+    "cpp": '#include <iostream>\nint main() { std::cout << "hello" << std::endl; }\n',
+    "java": 'public class Main { public static void main(String[] a) { System.out.println("hello"); } }\n',
+    "go": 'package main\n\nimport "fmt"\n\nfunc main() { fmt.Println("hello") }\n',
+    "rust": 'fn main() { println!("hello"); }\n',
+}
+
+def check_runtimes():
+    """Compile and run a hello world in every configured runtime"""
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from app.services.executor import SandboxExecutor
+    from app.services.runtimes import RUNTIMES
+
+    ok = True
+    for name, runtime in sorted(RUNTIMES.items()):
+        source = HELLO_WORLD.get(name)
+        if source is None:
+            print(f"⚠️  {name}: no hello world to try, skipped")
+            continue
+        result = SandboxExecutor(runtime).run(source)
+        if result["status"] == "OK" and result["stdout"].strip() == "hello":
+            print(f"✅ {name} ({runtime.image})")
+        else:
+            print(f"❌ {name} ({runtime.image}): {result['status']} {result['stderr']}")
+            ok = False
+    return ok
+
 def main():
     print("=" * 60)
     print("🔍 Online Judge Setup Verification")
@@ -122,8 +151,14 @@ def main():
     image_ok = check_docker_image()
     print()
     
+    checks = [python_ok, deps_ok, redis_ok, docker_ok, image_ok]
+    if "--runtimes" in sys.argv and docker_ok:
+        print("🧪 Checking Runtimes...")
+        checks.append(check_runtimes())
+        print()
+
     print("=" * 60)
-    if all([python_ok, deps_ok, redis_ok, docker_ok, image_ok]):
+    if all(checks):
         print("✅ All checks passed! You're ready to go!")
         print()
         print("Start the system:")